@@ -0,0 +1,56 @@
+"""Benchmark of the util.pack modes
+
+Compares encoding and decoding time as well as the packed size of sessions
+for all pack modes. Run from the repository root:
+
+    python benchmarks/pack_benchmark.py
+"""
+
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from util import pack
+
+MODES = ["json", "pickle", "binary"]
+ROUNDS = 2000
+
+def _session(teams):
+    return {
+        "userID": 4711,
+        "userRole": "coach",
+        "clientIP": "203.0.113.42",
+        "sessionToken": str(uuid.uuid4()),
+        "teamRoles": {str(1000 + i): ["team_manager", "team_coach", "team_member"][i % 3] for i in range(teams)}
+    }
+
+SHAPES = {
+    "member (1 team)": _session(1),
+    "coach (20 teams)": _session(20),
+    "power user (500 teams)": _session(500)
+}
+
+def _run(mode, session):
+    pack.MODE = mode
+    packed = pack.dumps(session)
+
+    encode = timeit.timeit(lambda: pack.dumps(session), number=ROUNDS) / ROUNDS
+    decode = timeit.timeit(lambda: pack.loads(packed), number=ROUNDS) / ROUNDS
+    # Typical request: decode the session and check the system role only
+    authenticate = timeit.timeit(lambda: pack.loads(packed)["userRole"], number=ROUNDS) / ROUNDS
+    return len(packed), encode, decode, authenticate
+
+def main():
+    print("%-24s %-8s %10s %12s %12s %12s" % ("shape", "mode", "bytes", "encode [us]", "decode [us]", "auth [us]"))
+    for name, session in SHAPES.items():
+        for mode in MODES:
+            if mode == "binary" and pack.msgpack is None:
+                continue
+            size, encode, decode, authenticate = _run(mode, session)
+            print("%-24s %-8s %10d %12.2f %12.2f %12.2f" % (name, mode, size, encode * 1e6, decode * 1e6, authenticate * 1e6))
+
+if __name__ == "__main__":
+    main()
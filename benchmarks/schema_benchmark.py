@@ -0,0 +1,48 @@
+"""Benchmark of the request validation modes
+
+Compares the time needed to validate typical request payloads with the
+jsonschema validators of the schema registry and with the generated checks
+of the "compiled" mode, including the uncached per-request loading of the
+schema that was done before the registry. Run from the repository root:
+
+    python benchmarks/schema_benchmark.py
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+
+import jsonschema
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from util.schema import SchemaRegistry, SCHEMA_DIR
+
+ROUNDS = 5000
+
+PAYLOADS = {
+    "user_login_req": {"mail": "coach@fableplus.com", "password": "test123"},
+    "user_registration_req": {"mail": "coach@fableplus.com", "password": "test123", "name": "Test Coach", "role": "coach"},
+    "team_member_add_req": {"members": [{"mail": "user%d@fableplus.com" % i, "role": "member"} for i in range(10)]},
+    "user_sessions_revoke_req": {"users": [1, 2, 3]}
+}
+
+def _uncached(name, payload):
+    with open(os.path.join(SCHEMA_DIR, name + ".json"), "r") as schema_file:
+        jsonschema.validate(payload, json.load(schema_file), format_checker=jsonschema.FormatChecker())
+
+def main():
+    registry = SchemaRegistry(compiled=False)
+    compiled = SchemaRegistry(compiled=True, cache_dir=tempfile.mkdtemp())
+
+    print("%-26s %14s %16s %15s %9s" % ("schema", "uncached [us]", "jsonschema [us]", "compiled [us]", "speedup"))
+    for name, payload in PAYLOADS.items():
+        uncached = timeit.timeit(lambda: _uncached(name, payload), number=ROUNDS // 10) / (ROUNDS // 10)
+        generic = timeit.timeit(lambda: registry.validate(name, payload), number=ROUNDS) / ROUNDS
+        fast = timeit.timeit(lambda: compiled.validate(name, payload), number=ROUNDS) / ROUNDS
+        print("%-26s %14.2f %16.2f %15.2f %8.1fx" % (name, uncached * 1e6, generic * 1e6, fast * 1e6, generic / fast))
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from urllib.parse import urlparse, urlunparse
 
 import dotenv
@@ -19,11 +20,115 @@ BASE_ROUTE = "/tpa/v" + VERSION
 DEFAULT_REDIS = "localhost:6379"
 DEFAULT_DB = "sqlite:///dev.db"
 
+# Comma separated list of redis nodes, keys are spread across them by consistent hashing.
+# Changing the list moves part of the keys to other nodes, so their sessions are lost.
 REDIS = os.environ.get("REDIS_HOST", DEFAULT_REDIS)
+REDIS_NODES = [node.strip() for node in REDIS.split(",") if node.strip()]
 REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD", None)
+# Upper bound for the connections held by each per-process redis pool, one pool per node
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "50"))
+# Encoding of values stored in redis: "json", "binary" (msgpack based, requires the msgpack package) or "pickle"
+PACK_MODE = os.environ.get("PACK_MODE", "json")
+# Number of keys requested per SCAN call when iterating over a database
+REDIS_SCAN_BATCH_SIZE = int(os.environ.get("REDIS_SCAN_BATCH_SIZE", "500"))
 
 DB_URI = os.environ.get("DB_URI", DEFAULT_DB)
 
+# Engine profiles with the connection pool settings and per-connection options of each environment.
+# Pool sizes apply per worker process and per database, pool_recycle and pool_timeout are given in seconds.
+# The statement timeout (seconds, None to disable) is set on PostgreSQL connections,
+# the pragmas are set on SQLite connections. WAL mode lets readers continue while a writer is active.
+DB_PROFILES = {
+    "dev": {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_timeout": None,
+        "sqlite_pragmas": {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -16000, "mmap_size": 0}
+    },
+    # Test databases are thrown away, so durability is traded for speed
+    "test": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 10,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_timeout": 30,
+        "sqlite_pragmas": {"journal_mode": "MEMORY", "synchronous": "OFF", "cache_size": -16000, "mmap_size": 0}
+    },
+    "live": {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout": 15,
+        "sqlite_pragmas": {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -64000, "mmap_size": 256 * 1024 * 1024}
+    }
+}
+# Name of the engine profile in use, the profile of the environment by default
+DB_PROFILE = os.environ.get("DB_PROFILE", ENVIRONMENT if ENVIRONMENT in DB_PROFILES else "dev")
+
+# Comma separated list of read replicas of DB_URI, reads of GET requests are spread across them.
+# Users read from the primary for DB_REPLICA_STICKY_TIME seconds after they wrote, so they see their own changes,
+# replicas are checked before use at most every DB_REPLICA_CHECK_INTERVAL seconds and skipped while unhealthy
+DB_REPLICAS = [uri.strip() for uri in os.environ.get("DB_REPLICAS", "").split(",") if uri.strip()]
+DB_REPLICA_STICKY_TIME = float(os.environ.get("DB_REPLICA_STICKY_TIME", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", "10"))
+
 DEBUG = os.environ.get("DEBUG", "false" if ENVIRONMENT == "live" else "true").lower() == "true"
 
-APP_SECRET = "supersecuresecret"
+# Signs session tokens and cached schema checks, the default is only accepted in the dev environment
+DEFAULT_APP_SECRET = "supersecuresecret"
+APP_SECRET = os.environ.get("APP_SECRET", DEFAULT_APP_SECRET)
+
+# Sessions expire after this many seconds of inactivity: 12h for dev environments, 30 minutes otherwise
+SESSION_TTL = int(os.environ.get("SESSION_TTL", str(60 * 60 * 12) if ENVIRONMENT == "dev" else str(60 * 30)))
+
+# Session storage backend: "redis", "redis_hash" (field level updates), "memory" (single process only)
+# or "signed" (stateless HMAC signed tokens)
+SESSION_STORE = os.environ.get("SESSION_STORE", "redis")
+# Revocations of signed tokens are shared through redis unless disabled,
+# each worker keeps the revocation entries it looked up for this many seconds
+SESSION_REVOCATION_SHARED = os.environ.get("SESSION_REVOCATION_SHARED", "true").lower() == "true"
+SESSION_REVOCATION_REFRESH = float(os.environ.get("SESSION_REVOCATION_REFRESH", "5"))
+
+# Request validation: "jsonschema" or "compiled" (generated python checks, cached in SCHEMA_CACHE_DIR).
+# The cache is only used if the directory belongs to the user running the app and no one else can access it,
+# by default it is a directory per user, created on first use
+SCHEMA_VALIDATION = os.environ.get("SCHEMA_VALIDATION", "jsonschema")
+SCHEMA_CACHE_DIR = os.environ.get("SCHEMA_CACHE_DIR", os.path.join(
+    tempfile.gettempdir(), "%s_schema_cache_%s" % (APP_ID, os.getuid() if hasattr(os, "getuid") else "user")
+))
+
+# Share of responses validated against their response schema (0 to 1), on for dev environments only,
+# and the CPU time in seconds response validation may take per request
+RESPONSE_VALIDATION_RATE = float(os.environ.get("RESPONSE_VALIDATION_RATE", "1" if ENVIRONMENT == "dev" else "0"))
+RESPONSE_VALIDATION_BUDGET = float(os.environ.get("RESPONSE_VALIDATION_BUDGET", "0.002"))
+
+# JSON encoder for responses: "orjson", "json" (standard library) or "auto" (orjson if installed)
+JSON_ENCODER = os.environ.get("JSON_ENCODER", "auto")
+
+# If set, the metrics route requires this token in the X-Metrics-Token header
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", None)
+
+# Default and maximum number of items per page of list routes
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", "100"))
+PAGE_SIZE_MAX = int(os.environ.get("PAGE_SIZE_MAX", "1000"))
+
+# Compression of responses with at least COMPRESSION_MIN_SIZE bytes, if the client accepts it
+COMPRESSION = os.environ.get("COMPRESSION", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+
+# Seconds clients may cache static assets without revalidating them
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", str(60 * 60)))
+
+# Number of rows fetched from the database per batch by the export routes
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+
+# Optional per-worker cache of decoded sessions, invalidated through redis pub/sub
+SESSION_CACHE = os.environ.get("SESSION_CACHE", "false").lower() == "true"
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.environ.get("SESSION_CACHE_TTL", "5"))
@@ -1,3 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 
-db = SQLAlchemy()
+from util import replicas
+
+class RoutingSession(Session):
+    """Session reading from a replica where possible, see `util.replicas`"""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kw):
+        if bind is None and not self._flushing and getattr(clause, "is_select", False):
+            engine = replicas.read_engine(self._db.engines)
+            if engine is not None:
+                return engine
+        elif self._flushing or getattr(clause, "is_dml", False):
+            replicas.record_write(self._db.engines)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kw)
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
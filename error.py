@@ -5,6 +5,14 @@ This module defines various exceptions that can occur during execution.
 
 import util
 
+def prerendered(cls):
+    """
+    Class decorator for errors without parameters. Their response body is
+    rendered on first use and reused for every later response.
+    """
+    cls._body = None
+    return cls
+
 class APIException(Exception):
     def __init__(self, message=None, status_code=500, error_code=1000):
         Exception.__init__(self, message)
@@ -13,12 +21,20 @@ class APIException(Exception):
         self.error_code = error_code
 
     def getResponse(self):
+        cls = type(self)
+        # Only the decorated class itself, subclasses may take parameters
+        if "_body" in cls.__dict__:
+            if cls._body is None:
+                cls._body = util.render(error_code=self.error_code, error_message=self.message)
+            return util.rendered_response(cls._body, status_code=self.status_code, error_code=self.error_code)
         return util.response(status_code=self.status_code, error_code=self.error_code, error_message=self.message)
 
+@prerendered
 class NotFoundError(APIException):
     def __init__(self):
         super(NotFoundError, self).__init__(status_code=404, error_code=1001, message="The requested ressource was not found")
 
+@prerendered
 class NoJsonPayloadException(APIException):
     def __init__(self):
         super(NoJsonPayloadException, self).__init__(status_code=400, error_code=1002, message="No JSON data in message body")
@@ -31,6 +47,7 @@ class BadParameterError(APIException):
     def __init__(self, description):
         super(BadParameterError, self).__init__(status_code=400, error_code=1005, message="Bad Parameter: " + description)
 
+@prerendered
 class MethodNotAllowedError(APIException):
     def __init__(self):
         super(MethodNotAllowedError, self).__init__(status_code=405, error_code=1004, message="Method not allowed in this context.")
@@ -43,26 +60,32 @@ class InvalidRequestHeader(APIException):
             super(InvalidRequestHeader, self).__init__(status_code=400, error_code=1006, message="The request header contains invalid or contradicting fields or values.")
 
 
+@prerendered
 class NoAuthorizationHeaderError(APIException):
     def __init__(self):
         super(NoAuthorizationHeaderError, self).__init__(status_code=401, error_code=1101, message="No authorization header")
 
+@prerendered
 class SessionExpiredError(APIException):
     def __init__(self):
         super(SessionExpiredError, self).__init__(status_code=401, error_code=1102, message="Your session has expired")
 
+@prerendered
 class InvalidSessionError(APIException):
     def __init__(self):
         super(InvalidSessionError, self).__init__(status_code=401, error_code=1103, message="The session token provided is invalid")
 
+@prerendered
 class ClientOriginViolation(APIException):
     def __init__(self):
         super(ClientOriginViolation, self).__init__(status_code=403, error_code=1104, message="The request was sent from a new IP address, please login again")
 
+@prerendered
 class AccessDeniedError(APIException):
     def __init__(self):
         super(AccessDeniedError, self).__init__(status_code=403, error_code=1105, message="The access to this function is not allowed for the logged in user")
 
+@prerendered
 class InvalidAuthorizationHeader(APIException):
     def __init__(self):
         super(InvalidAuthorizationHeader, self).__init__(status_code=403, error_code=1106, message="The authorization header is invalid")
@@ -1,12 +1,13 @@
 import traceback
 
+import redis
 import sqlalchemy
 from flask import Flask, request, g
 from flask_cors import CORS
 from flask_migrate import Migrate
 
 import config
-from util import converters
+from util import converters, engines, replicas
 from database import db
 
 # Define API base route
@@ -17,27 +18,40 @@ app = Flask(__name__)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = config.DB_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engines.engine_options(config.DB_URI)
+app.config['SQLALCHEMY_BINDS'] = {key: dict(engines.engine_options(uri), url=uri) for key, uri in replicas.binds(config.DB_REPLICAS).items()}
 
 app.config["SECRET_KEY"] = config.APP_SECRET
 
 app.url_map.converters["str_list"] = converters.StringListConverter
 
-CORS(app)
+CORS(app, expose_headers=["X-Session-Token"])
 db.init_app(app)
+with app.app_context():
+    for bind, engine in db.engines.items():
+        engines.configure(engine, bind=bind or engines.PRIMARY)
 Migrate(app, db)
 
 # Import modules after app initialization to avoid circular references
 from error import APIException, NotFoundError, MethodNotAllowedError
-from util import auth
+from util import auth, compression, log
 import util
 import views.static
 import views.user
 import views.team
+import views.export
 
 # Register API routes
 app.register_blueprint(views.static.static, url_prefix=BASE_ROUTE + "/static")
 app.register_blueprint(views.user.user, url_prefix=BASE_ROUTE + "/user")
 app.register_blueprint(views.team.team, url_prefix=BASE_ROUTE + "/team")
+app.register_blueprint(views.export.export, url_prefix=BASE_ROUTE + "/export")
+
+# Prepare the session store once per process instead of on every request
+try:
+    auth.init_sessions()
+except redis.exceptions.ConnectionError:
+    log.warn("Redis is not reachable, session store could not be initialized")
 
 # Global request handlers
 @app.errorhandler(APIException)
@@ -77,9 +91,17 @@ def handle_authentication():
 
 @app.after_request
 def save_session_state(r):
-    """Saves the current session state after each request to the redis database"""
-    auth.save_session()
+    """Saves the current session state after each request to the session store"""
+    token = auth.save_session()
+    if token is not None:
+        # The session was reissued, the client has to use the new token from now on
+        r.headers["X-Session-Token"] = token
     return r
 
+@app.after_request
+def compress_response(r):
+    """Compresses the response body if the client accepts it"""
+    return compression.compress_response(r)
+
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,72 @@
+import argparse
+import itertools
+import math
+import time
+
+import config
+from util import log
+from util.RedisAdapter import get_adapter, registered_databases
+from util.session import SESSION_DB
+
+def reap(databases, batch_size=None):
+    for database in databases:
+        stats = get_adapter(database).reap(batch_size)
+        if stats["bytes_reclaimed"] is None:
+            reclaimed = "unknown"
+        else:
+            reclaimed = "%d bytes" % stats["bytes_reclaimed"]
+        log.info("Reaped %s: removed %d of %d keys and %d entries from %d indexes, reclaimed %s." % (
+            database, stats["keys_removed"], stats["keys"], stats["index_entries_removed"], stats["indexes"], reclaimed
+        ))
+
+def _batches(keys, batch_size):
+    keys = iter(keys)
+    while True:
+        batch = list(itertools.islice(keys, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def expire_legacy_sessions(batch_size=None):
+    """
+    Sets a TTL on sessions stored before sessions expired natively in redis. Those were
+    rewritten without TTL or with an expiration far in the future and would be kept forever.
+    Sessions past their stored expireDate are deleted, all others expire within SESSION_TTL.
+    """
+    adapter = get_adapter(SESSION_DB)
+    now = time.time()
+    updated = removed = 0
+    for keys in _batches(adapter.iterate_keys(batch_size), batch_size or config.REDIS_SCAN_BATCH_SIZE):
+        legacy = [key for key, ttl in adapter.ttl_many(keys).items() if ttl == -1 or ttl > config.SESSION_TTL]
+        ttls = {}
+        expired = []
+        for key, session in adapter.get_many(legacy).items():
+            if session is None:
+                continue
+            remaining = min(session.get("expireDate", now + config.SESSION_TTL) - now, config.SESSION_TTL)
+            if remaining > 0:
+                ttls[key] = math.ceil(remaining)
+            else:
+                expired.append(key)
+        adapter.expire_many(ttls)
+        removed += adapter.unset_many(expired)
+        updated += len(ttls)
+    log.info("Expired legacy sessions: set a TTL on %d sessions and removed %d expired ones." % (updated, removed))
+    return updated, removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drops key list and index entries of expired redis values.")
+    parser.add_argument("databases", nargs="*", help="databases to reap, all registered databases by default")
+    parser.add_argument("--batch-size", type=int, default=None, help="number of entries scanned per round trip")
+    parser.add_argument("--interval", type=float, default=None, help="keep running and reap every INTERVAL seconds")
+    parser.add_argument("--expire-legacy-sessions", action="store_true", help="set a TTL on sessions stored without one first")
+    args = parser.parse_args()
+
+    if args.expire_legacy_sessions:
+        expire_legacy_sessions(args.batch_size)
+    while True:
+        reap(args.databases or registered_databases(), args.batch_size)
+        if args.interval is None:
+            break
+        time.sleep(args.interval)
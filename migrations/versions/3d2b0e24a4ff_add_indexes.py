@@ -0,0 +1,42 @@
+"""Add indexes for lookups by team, by user and role and by change time
+
+Revision ID: 3d2b0e24a4ff
+Revises: 3f68ae781db3
+Create Date: 2026-10-18 18:41:27.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d2b0e24a4ff'
+down_revision = '3f68ae781db3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('team', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_team_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('team_members', schema=None) as batch_op:
+        batch_op.create_index('ix_team_members_team_id_user_id', ['team_id', 'user_id'], unique=False)
+        batch_op.create_index('ix_team_members_user_id_role', ['user_id', 'role'], unique=False)
+        batch_op.create_index(batch_op.f('ix_team_members_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_updated_at'))
+
+    with op.batch_alter_table('team_members', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_team_members_updated_at'))
+        batch_op.drop_index('ix_team_members_user_id_role')
+        batch_op.drop_index('ix_team_members_team_id_user_id')
+
+    with op.batch_alter_table('team', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_team_updated_at'))
@@ -0,0 +1,52 @@
+"""Track changes of users, teams and team memberships
+
+Revision ID: 3f68ae781db3
+Revises: 806ccecd2925
+Create Date: 2026-10-18 18:38:09.946598
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f68ae781db3'
+down_revision = '806ccecd2925'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('team', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default=sa.text('1')))
+
+    with op.batch_alter_table('team_members', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default=sa.text('1')))
+
+    # Existing rows count as changed now, so the next export since any earlier time includes them.
+    # The models store naive UTC times.
+    now = datetime.utcnow()
+    for table in ('team', 'team_members', 'user'):
+        op.execute(sa.table(table, sa.column('updated_at', sa.DateTime())).update().values(updated_at=now))
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('version')
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('team_members', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('team', schema=None) as batch_op:
+        batch_op.drop_column('version')
+        batch_op.drop_column('updated_at')
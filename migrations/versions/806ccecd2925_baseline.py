@@ -0,0 +1,50 @@
+"""Baseline schema of users, teams and team memberships
+
+Revision ID: 806ccecd2925
+Revises: 
+Create Date: 2026-10-18 18:38:00.490708
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '806ccecd2925'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('team',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('mail', sa.String(), nullable=True),
+    sa.Column('trial_period_expire_date', sa.DateTime(), nullable=True),
+    sa.Column('registered', sa.Boolean(), nullable=True),
+    sa.Column('password_hash', sa.String(), nullable=True),
+    sa.Column('password_salt', sa.String(), nullable=True),
+    sa.Column('role', sa.Enum('GLOBAL_ADMIN', 'USER', 'PARTICIPANT', name='systemrole'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('mail')
+    )
+    op.create_table('team_members',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.Enum('MANAGER', 'COACH', 'MEMBER', 'READER', name='teamrole'), nullable=True),
+    sa.ForeignKeyConstraint(['team_id'], ['team.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'team_id')
+    )
+
+
+def downgrade():
+    op.drop_table('team_members')
+    op.drop_table('user')
+    op.drop_table('team')
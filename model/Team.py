@@ -2,6 +2,8 @@
 Team model definition
 """
 
+from datetime import datetime
+
 from sqlalchemy.ext.associationproxy import association_proxy
 
 from database import db
@@ -10,6 +12,11 @@ from model.Roles import TeamRole
 
 class TeamMember(db.Model):
     __tablename__ = "team_members"
+    __table_args__ = (
+        # The primary key starts with user_id, these serve the lookups by team and by user and role
+        db.Index("ix_team_members_team_id_user_id", "team_id", "user_id"),
+        db.Index("ix_team_members_user_id_role", "user_id", "role"),
+    )
 
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
     team_id = db.Column(db.Integer, db.ForeignKey("team.id"), primary_key=True)
@@ -19,12 +26,19 @@ class TeamMember(db.Model):
 
     role = db.Column(db.Enum(TeamRole), default=TeamRole.MEMBER)
 
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
 class Team(db.Model):
     """Represents a team"""
     id = db.Column(db.Integer, primary_key=True)
     
     name = db.Column(db.String)
 
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Increased on every change of the team, its members or their users, used as entity tag
+    version = db.Column(db.Integer, nullable=False, default=1)
+
     team_members = db.relationship(TeamMember, back_populates="team", cascade="all, delete-orphan")
     members = association_proxy("team_members", "user")
 
@@ -2,6 +2,8 @@
 User model definition
 """
 
+from datetime import datetime
+
 from sqlalchemy.ext.associationproxy import association_proxy
 
 from database import db
@@ -24,8 +26,13 @@ class User(db.Model): # type: ignore
 
     role = db.Column(db.Enum(SystemRole), default=SystemRole.PARTICIPANT)
 
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Increased on every change of the user's representations, used as entity tag
+    version = db.Column(db.Integer, nullable=False, default=1)
+
     team_memberships = db.relationship("TeamMember", back_populates="user", cascade="all,delete-orphan")
-    teams = association_proxy("team_members", "team")
+    teams = association_proxy("team_memberships", "team")
 
     def __repr__(self):
         return "<User(id=%s, mail=%s, role=%s)>" % (
@@ -0,0 +1,39 @@
+"""
+Data controller for bulk exports
+
+Exports iterate over the rows in batches of `config.EXPORT_BATCH_SIZE`. Only
+columns are selected, so no ORM objects are kept in the session, and on
+databases supporting it the rows are streamed through a server-side cursor.
+"""
+
+from typing import Iterator
+
+import config
+from database import db
+from model.User import User
+from model.Team import Team, TeamMember
+
+def _iterate(query, updated_at, order_by, since=None) -> Iterator[dict]:
+    if since is not None:
+        # Changes are exported in the order they were made, which the index on the change time provides
+        query = query.filter(updated_at >= since)
+        order_by = [updated_at] + order_by
+    for row in query.order_by(*order_by).yield_per(config.EXPORT_BATCH_SIZE):
+        yield row._asdict()
+
+def export_users(since=None):
+    """Iterates over all users, or the users changed since the given time. Credentials are left out"""
+    query = db.session.query(
+        User.id, User.mail, User.name, User.role, User.registered, User.trial_period_expire_date, User.updated_at
+    )
+    return _iterate(query, User.updated_at, [User.id], since)
+
+def export_teams(since=None):
+    """Iterates over all teams, or the teams changed since the given time"""
+    query = db.session.query(Team.id, Team.name, Team.updated_at)
+    return _iterate(query, Team.updated_at, [Team.id], since)
+
+def export_team_members(since=None):
+    """Iterates over all team memberships, or the memberships changed since the given time"""
+    query = db.session.query(TeamMember.team_id, TeamMember.user_id, TeamMember.role, TeamMember.updated_at)
+    return _iterate(query, TeamMember.updated_at, [TeamMember.team_id, TeamMember.user_id], since)
@@ -16,7 +16,8 @@ from model.User import User
 from model.Roles import SystemRole, OrgRole, TeamRole
 from model.Team import Team, TeamMember
 from error import NotFoundError
-from util.auth import AccessDeniedError, require, refresh_user_access, revoke_user_access
+from util.auth import AccessDeniedError, require, refresh_team_access
+from util.pagination import paginate
 
 def get_team_by_id(team_id):
     """Returns a team object by team ID, raises a NotFoundError if no team was found"""
@@ -36,34 +37,35 @@ def get_team_by_id(team_id):
 def get_teams():
     return Team.query.filter_by().all()
 
-def get_user_teams(restrict_to_role: Union[TeamRole, bool] = True):
-    """Get a list of all teams the user can see"""
+def get_user_teams(restrict_to_role: Union[TeamRole, bool] = True, limit=None, cursor=None):
+    """Get a page of the teams the user can see, and the cursor of the next page"""
     if g.session["userRole"] == SystemRole.GLOBAL_ADMIN:
-        return Team.query.all()
+        query = Team.query
+    elif "team" in g.session:
+        query = Team.query.filter(Team.id == get_team_by_id(g.session["team"]).id)
+    elif type(restrict_to_role) is bool and restrict_to_role:
+        # Joined instead of tested per team with EXISTS, so the memberships of the user are read through their index
+        query = Team.query.join(TeamMember).filter(
+            TeamMember.user_id == g.session["userID"],
+            TeamMember.role != TeamRole.MEMBER
+        )
+    elif restrict_to_role is not None:
+        query = Team.query.join(TeamMember).filter(
+            TeamMember.user_id == g.session["userID"],
+            TeamMember.role == restrict_to_role
+        )
     else:
-        if "team" in g.session:
-            user_teams = [get_team_by_id(g.session["team"])]
-        elif type(restrict_to_role) is bool and restrict_to_role:
-            user_teams = Team.query.filter(
-                Team.team_members.any(
-                    sqlalchemy.and_(
-                        TeamMember.user_id == g.session["userID"],
-                        TeamMember.role != TeamRole.MEMBER
-                    )
-                )
-            ).all()
-        elif restrict_to_role is not None:
-            user_teams = Team.query.filter(
-                Team.team_members.any(
-                    sqlalchemy.and_(
-                        TeamMember.user_id == g.session["userID"],
-                        TeamMember.role == restrict_to_role)
-                    )
-                ).all()
-        else:
-            user_teams = Team.query.filter(Team.members.any(User.id == g.session["userID"])).all()
-        
-        return user_teams
+        query = Team.query.join(TeamMember).filter(TeamMember.user_id == g.session["userID"])
+
+    return paginate(query, Team.id, limit, cursor)
+
+def get_team_members(team, limit=None, cursor=None):
+    """
+    Get a page of the users in a team, and the cursor of the next page.
+    Memberships and users are read in a single join, whatever the size of the team.
+    """
+    query = User.query.join(TeamMember).filter(TeamMember.team_id == team.id)
+    return paginate(query, User.id, limit, cursor)
 
 def create_team(name, members=None):
     team = Team(name=name)
@@ -90,66 +92,69 @@ def update_team(team, name=None):
     if name is not None:
         team.name = name
 
+    team.version = Team.version + 1
     db.session.commit()
 
     return team
 
 def add_team_members(team, members, skip_access_check=False):
+    """
+    Adds users to a team by mail or changes their role, creating users for unknown mails.
+    Users and memberships are read, inserted and updated in bulk and committed at once.
+    """
     if not skip_access_check:
         ensure_team_edit_privileges(team)
 
-    member_users = {member["mail"]: user_controller.get_user_by_mail(member["mail"]) for member in members} 
-
-    for member in members:
-        user = member_users[member["mail"]]
-
-        if "role" in member:
-            role = TeamRole(member["role"])
-        else:
-            role = TeamRole.MEMBER
-
-        team_member = None
-        if user is None:
-            user = user_controller.create_user(member["mail"])
-        else:
-            team_member = TeamMember.query.filter(TeamMember.user_id == user.id, TeamMember.team_id == team.id).one_or_none()
-            if team_member is not None:
-                # If user is already part of the team, update the role
-                team_member.role = TeamRole(member["role"])
-                refresh_user_access(user, role, team.id)
-
-        if team_member is None:
-            # If not already part of the team
-            team_member = TeamMember()
-            team_member.team = team
-            team_member.user = user
-            team_member.role = role
-            db.session.add(team_member)
-            team.team_members.append(team_member)
-            refresh_user_access(user, role, team.id)
-
+    # For repeated mails, the last entry wins
+    roles = {member["mail"]: TeamRole(member["role"]) if "role" in member else TeamRole.MEMBER for member in members}
+
+    users = user_controller.get_users_by_mail(roles)
+    new_users = user_controller.create_users(mail for mail in roles if mail not in users)
+    users.update(new_users)
+
+    current_roles = dict(
+        db.session.query(TeamMember.user_id, TeamMember.role)
+        .filter(TeamMember.team_id == team.id, TeamMember.user_id.in_([user.id for user in users.values()]))
+    )
+    added = []
+    changed = []
+    for mail, role in roles.items():
+        user = users[mail]
+        if user.id not in current_roles:
+            added.append((user, role))
+        elif current_roles[user.id] != role:
+            changed.append((user, role))
+
+    if added:
+        db.session.execute(sqlalchemy.insert(TeamMember), [{"team_id": team.id, "user_id": user.id, "role": role} for user, role in added])
+    if changed:
+        # Bulk update by primary key
+        db.session.execute(sqlalchemy.update(TeamMember), [{"team_id": team.id, "user_id": user.id, "role": role} for user, role in changed])
+
+    # Users created just now have no sessions yet
+    access = {user.id: role for user, role in added + changed if user.mail not in new_users}
+
+    team.version = Team.version + 1
     db.session.commit()
 
+    # Sessions only change once the memberships are stored, with a single call to the session store
+    refresh_team_access(team.id, access)
+
     return team
 
 def remove_team_members(team, members):
-    """Removes a user from a team, raises a NotFoundError if no association entry was found"""
+    """Removes users from a team by mail, mails of users not in the team are ignored"""
     ensure_team_edit_privileges(team)
-    
-    for m in members:
-        try:
-            user = user_controller.get_user_by_mail(m)
-
-            tm = TeamMember.query.filter(TeamMember.user == user, TeamMember.team == team).one_or_none()
-            if tm:
-                revoke_user_access(user.id, team_id=team.id)
-                team.team_members.remove(tm)
 
-        except ValueError:
-            raise NotFoundError()
+    user_ids = [user_id for user_id, in db.session.query(User.id).join(TeamMember).filter(TeamMember.team_id == team.id, User.mail.in_(set(members)))]
+    if user_ids:
+        TeamMember.query.filter(TeamMember.team_id == team.id, TeamMember.user_id.in_(user_ids)).delete()
 
+    team.version = Team.version + 1
     db.session.commit()
 
+    refresh_team_access(team.id, dict.fromkeys(user_ids))
+
     return team
 
 def ensure_team_edit_privileges(team):
@@ -11,9 +11,10 @@ from flask import g
 
 from database import db
 from model.User import User
+from model.Team import Team, TeamMember
 from model.Roles import SystemRole, OrgRole
 from error import NotFoundError
-from util import hash_password, get_request_ip
+from util import auth, hash_password, get_request_ip
 
 from datetime import datetime, date, timedelta
 
@@ -28,6 +29,24 @@ def get_user_by_mail(mail):
     """Searches for a user by mail, returns None if no user is found"""
     return User.query.filter_by(mail=mail).first()
 
+def get_users_by_mail(mails):
+    """Searches for the users with the given mails in a single query, returns the users found by mail"""
+    mails = set(mails)
+    if not mails:
+        return {}
+    return {u.mail: u for u in User.query.filter(User.mail.in_(mails))}
+
+def create_users(mails, role: SystemRole=SystemRole.PARTICIPANT):
+    """
+    Creates users without password for the given mails in a single insert, returns them by mail.
+    Unlike `create_user`, the changes are not committed, so they can be part of a larger transaction.
+    """
+    mails = set(mails)
+    if not mails:
+        return {}
+    db.session.execute(sqlalchemy.insert(User), [{"mail": mail, "role": role} for mail in mails])
+    return get_users_by_mail(mails)
+
 def create_user(mail: str, role: SystemRole=None, password: str=None, name: str=None):
         u = User(mail=mail)
         
@@ -74,4 +93,15 @@ def update_user(user, mail=None, role=None, password=None, name=None, hideTutori
             user.password_hash = password_hash
             user.password_salt = password_salt
 
+        user.version = User.version + 1
+        if mail is not None or name is not None or (role is not None and type(role) is SystemRole):
+            # Team member lists show these fields, so cached lists of the user's teams are outdated as well
+            Team.query.filter(
+                Team.id.in_(db.session.query(TeamMember.team_id).filter(TeamMember.user_id == user.id))
+            ).update({Team.version: Team.version + 1}, synchronize_session=False)
+
         db.session.commit()
+
+def revoke_sessions(user_ids):
+    """Logs the given users out of all their sessions, returns the number of revoked sessions if known"""
+    return auth.destroy_user_sessions(user_ids)
@@ -1,11 +1,20 @@
 import pytest
 import os
 import csv
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Set before the app creates its database engines
+os.environ.setdefault("DB_PROFILE", "test")
 
 import main as healthcheck_backend
 from main import app
 from setup import mock_data
 from database import db
+from model.Roles import TeamRole
+from model.Team import Team, TeamMember
+from model.User import User
 from tempfile import mkstemp
 from TestClient import TestClient
 
@@ -56,6 +65,17 @@ def data():
 def credentials(data):
     return data("credentials")[0]
 
+@pytest.fixture(scope="session")
+def admin_credentials(data):
+    return data("credentials")[1]
+
+@pytest.fixture(scope="module")
+def admin_client(client_factory, admin_credentials):
+    client = client_factory()
+    client.login(admin_credentials)
+    yield client
+    client.logout()
+
 @pytest.fixture(scope="module")
 def tempdb():
     handler, path = mkstemp(suffix=".db")
@@ -71,4 +91,33 @@ def tempdb():
 
     yield db_connectstring
 
-    os.remove(path)
\ No newline at end of file
+    os.remove(path)
+
+@pytest.fixture(scope="module")
+def team_id(tempdb):
+    """ID of a team managed by the coach, with user@fableplus.com as member"""
+    with app.app_context():
+        team = Team(name="Team")
+        db.session.add(team)
+        db.session.add(TeamMember(team=team, user=User.query.filter_by(mail="coach@fableplus.com").one(), role=TeamRole.MANAGER))
+        db.session.add(TeamMember(team=team, user=User.query.filter_by(mail="user@fableplus.com").one(), role=TeamRole.MEMBER))
+        db.session.commit()
+        return team.id
+
+@pytest.fixture
+def count_queries(tempdb):
+    """Returns a context manager collecting the SQL statements executed within it"""
+    with app.app_context():
+        engine = db.engine
+
+    @contextmanager
+    def _count_queries():
+        queries = []
+        listener = lambda conn, cursor, statement, *args: queries.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            yield queries
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+    return _count_queries
@@ -0,0 +1,78 @@
+import gzip
+import os
+
+import pytest
+
+import config
+from main import app
+from database import db
+from model.Team import Team
+from util import compression
+from util.assets import STATIC_DIR
+
+@pytest.fixture(scope="module")
+def teams(team_id):
+    """Adds enough teams for the team list to be worth compressing"""
+    with app.app_context():
+        db.session.add_all([Team(name="Compressed team %d" % i) for i in range(1, 60)])
+        db.session.commit()
+
+def test_static_asset(unauthorized_client):
+    with open(os.path.join(STATIC_DIR, "openapi.yaml"), "rb") as spec_file:
+        spec = spec_file.read()
+
+    r = unauthorized_client.get("/static/openapi.yaml")
+    assert r.get_data() == spec
+    assert "Content-Encoding" not in r.headers
+    assert r.mimetype == "application/yaml"
+    assert r.cache_control.max_age == config.STATIC_MAX_AGE
+
+    r = unauthorized_client.get("/static/openapi.yaml", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(r.get_data()) == spec
+    assert "Accept-Encoding" in r.headers["Vary"]
+
+    r = unauthorized_client.get("/static/openapi.yaml", headers={"Accept-Encoding": "gzip", "If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+    assert r.get_data() == b""
+
+def test_json_compression(teams, admin_client, monkeypatch):
+    r = admin_client.get("/team", headers={"Accept-Encoding": "gzip, deflate"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert len(gzip.decompress(r.get_data())) >= config.COMPRESSION_MIN_SIZE
+    assert b"Compressed team 59" in gzip.decompress(r.get_data())
+
+    r = admin_client.get("/team", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in r.headers
+    assert len(r.json["teams"]) == 60
+
+    # Too small to be worth it
+    monkeypatch.setattr(config, "COMPRESSION_MIN_SIZE", 1024 * 1024)
+    r = admin_client.get("/team", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in r.headers
+
+    monkeypatch.setattr(config, "COMPRESSION_MIN_SIZE", 16)
+    monkeypatch.setattr(config, "COMPRESSION", False)
+    r = admin_client.get("/team", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in r.headers
+
+def test_compressed_etag(admin_client, team_id, monkeypatch):
+    monkeypatch.setattr(config, "COMPRESSION_MIN_SIZE", 16)
+    path = "/team/%d/members" % team_id
+    r = admin_client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["ETag"].startswith("W/")
+
+    r = admin_client.get(path, headers={"Accept-Encoding": "gzip", "If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("*", "br"),
+    ("identity", None)
+])
+def test_negotiation(monkeypatch, accept, expected):
+    monkeypatch.setattr(compression, "_ENCODINGS", {"br": (lambda data, level: data, 4, 11), "gzip": compression._ENCODINGS["gzip"]})
+    with app.test_request_context(headers={"Accept-Encoding": accept}):
+        assert compression.negotiate() == expected
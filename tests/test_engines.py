@@ -0,0 +1,87 @@
+import os
+from tempfile import mkstemp
+
+import pytest
+import sqlalchemy
+from sqlalchemy import text
+
+from main import app
+from database import db
+from util import engines, metrics
+
+@pytest.fixture
+def path():
+    handler, path = mkstemp(suffix=".db")
+    os.close(handler)
+    yield path
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def _pragmas(connection):
+    return {
+        pragma: connection.execute(text("PRAGMA %s" % pragma)).scalar()
+        for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size")
+    }
+
+def test_engine_options():
+    options = engines.engine_options("sqlite:///dev.db", "live")
+    assert options["poolclass"] is engines.TimedQueuePool
+    assert options["pool_size"] == 10
+    assert options["pool_pre_ping"] is True
+
+    assert engines.engine_options("sqlite://", "live") == {}
+    assert engines.engine_options("sqlite:///file:test?mode=memory&uri=true", "live") == {}
+
+    with pytest.raises(ValueError):
+        engines.engine_options("sqlite:///dev.db", "unknown")
+
+def test_sqlite_pragmas(path):
+    uri = "sqlite:///" + path
+    engine = sqlalchemy.create_engine(uri, **engines.engine_options(uri, "live"))
+    engines.configure(engine, bind="test_live", profile="live")
+    try:
+        with engine.connect() as connection:
+            assert _pragmas(connection) == {
+                "journal_mode": "wal", "synchronous": 1, "cache_size": -64000, "mmap_size": 256 * 1024 * 1024
+            }
+    finally:
+        engine.dispose()
+
+def test_profile_of_the_app(tempdb):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            assert _pragmas(connection)["journal_mode"] == "memory"
+            assert _pragmas(connection)["synchronous"] == 0
+
+def test_checkout_wait_is_measured(path):
+    uri = "sqlite:///" + path
+    engine = sqlalchemy.create_engine(uri, **engines.engine_options(uri))
+    engines.configure(engine, bind="test_checkout")
+    try:
+        for _ in range(3):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+
+        # The label survives replacing the pool
+        engine.dispose()
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    finally:
+        engine.dispose()
+
+    assert engines.checkout_seconds.count(bind="test_checkout") == 4
+    assert 'db_pool_checkout_seconds_count{bind="test_checkout"} 4' in metrics.render()
+
+def test_histogram():
+    histogram = metrics.Histogram("test_histogram_seconds", "Test histogram", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(value)
+
+    rendered = metrics.render()
+    assert "# TYPE test_histogram_seconds histogram" in rendered
+    assert 'test_histogram_seconds_bucket{le="0.1"} 2' in rendered
+    assert 'test_histogram_seconds_bucket{le="1.0"} 3' in rendered
+    assert 'test_histogram_seconds_bucket{le="+Inf"} 4' in rendered
+    assert "test_histogram_seconds_sum 5.65" in rendered
+    assert "test_histogram_seconds_count 4" in rendered
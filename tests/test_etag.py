@@ -0,0 +1,56 @@
+import pytest
+
+from main import app
+from model.User import User
+from modules.user import controller as user_controller
+
+@pytest.fixture(scope="module")
+def coach(client_factory, credentials, team_id):
+    # Logged in after the team was created, so the session knows the coach manages it
+    client = client_factory()
+    client.login(credentials)
+    yield client
+    client.logout()
+
+def _revalidate(client, path):
+    """Returns the entity tag of a resource after checking that it's not sent again while unchanged"""
+    r = client.get(path)
+    assert r.status_code == 200
+    assert r.headers["ETag"].startswith("\"")
+    assert "no-cache" in r.headers["Cache-Control"]
+
+    r = client.get(path, headers={"If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+    assert r.get_data() == b""
+    return r.headers["ETag"]
+
+def test_user_info(coach):
+    tag = _revalidate(coach, "/user/info")
+    assert coach.post("/user/update", json={"name": "Renamed Coach"}).status_code == 200
+
+    r = coach.get("/user/info", headers={"If-None-Match": tag})
+    assert r.status_code == 200
+    assert r.json["name"] == "Renamed Coach"
+    assert r.headers["ETag"] != tag
+
+def test_team_info(coach, team_id):
+    path = "/team/%d" % team_id
+    tag = _revalidate(coach, path)
+    assert coach.patch(path, json={"name": "Renamed"}).status_code == 200
+
+    r = coach.get(path, headers={"If-None-Match": tag})
+    assert r.status_code == 200
+    assert r.json["name"] == "Renamed"
+    assert _revalidate(coach, path) != tag
+
+def test_team_members_follow_user_changes(coach, team_id):
+    path = "/team/%d/members" % team_id
+    tag = _revalidate(coach, path)
+    assert coach.get(path, query_string={"limit": 1}).headers["ETag"] != tag
+
+    with app.app_context():
+        user_controller.update_user(User.query.filter_by(mail="user@fableplus.com").one(), name="Renamed Member")
+
+    r = coach.get(path, headers={"If-None-Match": tag})
+    assert r.status_code == 200
+    assert "Renamed Member" in [m.get("name") for m in r.json["members"]]
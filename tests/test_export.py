@@ -0,0 +1,58 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import config
+from main import app
+from database import db
+from model.Roles import TeamRole
+from model.Team import Team, TeamMember
+from model.User import User
+
+@pytest.fixture(scope="module")
+def team(tempdb):
+    with app.app_context():
+        team = Team(name="Export")
+        db.session.add(team)
+        user = User.query.filter_by(mail="user@fableplus.com").one()
+        db.session.add(TeamMember(team=team, user=user, role=TeamRole.MEMBER))
+        db.session.commit()
+        return team.id
+
+def _lines(r):
+    assert r.status_code == 200
+    assert r.mimetype == "application/x-ndjson"
+    return [json.loads(line) for line in r.get_data().splitlines()]
+
+def test_export_users(admin_client, team, monkeypatch):
+    # Smaller batches than rows, so the output is written in several chunks
+    monkeypatch.setattr(config, "EXPORT_BATCH_SIZE", 3)
+    r = admin_client.get("/export/users")
+    assert r.is_streamed
+    users = _lines(r)
+
+    assert [u["id"] for u in users] == sorted(u["id"] for u in users)
+    assert {"coach@fableplus.com", "user@fableplus.com", "admin@fableplus.com"} <= {u["mail"] for u in users}
+    assert all("password_hash" not in u and "password_salt" not in u for u in users)
+    assert {u["role"] for u in users} <= {"admin", "coach", "member"}
+
+def test_export_teams_and_members(admin_client, team):
+    teams = _lines(admin_client.get("/export/teams"))
+    assert {"id": team, "name": "Export"}.items() <= next(t for t in teams if t["id"] == team).items()
+
+    members = _lines(admin_client.get("/export/members"))
+    assert {(m["team_id"], m["role"]) for m in members} == {(team, "team_member")}
+
+def test_export_since(admin_client, team):
+    teams = _lines(admin_client.get("/export/teams"))
+    since = max(t["updated_at"] for t in teams)
+    assert _lines(admin_client.get("/export/teams", query_string={"since": since})) == [t for t in teams if t["updated_at"] == since]
+
+    future = (datetime.utcnow() + timedelta(days=1)).isoformat() + "+00:00"
+    assert _lines(admin_client.get("/export/users", query_string={"since": future})) == []
+
+    assert admin_client.get("/export/users", query_string={"since": "yesterday"}).status_code == 400
+
+def test_export_requires_admin(client):
+    assert client.get("/export/users").status_code == 403
@@ -0,0 +1,57 @@
+import datetime
+import decimal
+import json
+import uuid
+
+import pytest
+
+import config
+from error import AccessDeniedError, NotFoundError
+from main import app
+from util import json_encoder
+
+PAYLOAD = {
+    "b": [1, 2.5, None, True, "ä"],
+    "a": {"nested": {"z": 1, "y": 2}},
+    "date": datetime.datetime(2020, 9, 17, 12, 30),
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "amount": decimal.Decimal("1.10")
+}
+
+def test_encoders_match_flask():
+    with app.app_context():
+        expected = json.loads(app.json.dumps(PAYLOAD))
+
+    for name in ["json", "orjson"]:
+        if name == "orjson" and json_encoder.orjson is None:
+            continue
+        encoded = json_encoder._ENCODERS[name](PAYLOAD)
+        assert json.loads(encoded) == expected
+        assert encoded.startswith(b'{"a":')
+
+def test_orjson_falls_back_for_big_integers():
+    if json_encoder.orjson is None:
+        pytest.skip("orjson is not installed")
+    assert json_encoder._dumps_orjson({"n": 2 ** 70}) == b'{"n":1180591620717411303424}'
+
+def test_unknown_encoder(monkeypatch):
+    monkeypatch.setattr(config, "JSON_ENCODER", "missing")
+    with pytest.raises(KeyError):
+        json_encoder.get_encoder()
+
+def test_prerendered_errors(unauthorized_client):
+    with app.test_request_context():
+        first = NotFoundError().getResponse()
+        second = NotFoundError().getResponse()
+        denied = AccessDeniedError().getResponse()
+
+    assert first.get_data() == second.get_data()
+    assert NotFoundError._body is not None
+    assert first.headers is not second.headers
+    assert first.status_code == 404 and first.headers["X-ErrorCode"] == "1001"
+    assert json.loads(denied.get_data())["error"]["errorCode"] == 1105
+
+    r = unauthorized_client.get("/user/info")
+    assert r.status_code == 401
+    assert r.headers["X-ErrorCode"] == "1101"
+    assert r.json["error"]["errorMessage"] == "No authorization header"
@@ -0,0 +1,56 @@
+import pytest
+
+from util import pack
+
+@pytest.fixture
+def binary_mode(monkeypatch):
+    monkeypatch.setattr(pack, "MODE", "binary")
+
+def _session(teams):
+    return {
+        "userID": 1,
+        "userRole": "coach",
+        "clientIP": "127.0.0.1",
+        "sessionToken": "a3c4c3c8-6a49-4d5b-9a46-2f3c0e1cf5b8",
+        "teamRoles": {str(i): "team_member" for i in range(teams)}
+    }
+
+def test_binary_roundtrip(binary_mode):
+    session = _session(3)
+    packed = pack.dumps(session)
+
+    assert packed[0] == pack.SCHEMA_VERSION
+    assert pack.loads(packed) == session
+
+def test_large_maps_are_decoded_lazily(binary_mode):
+    session = _session(500)
+
+    loaded = pack.loads(pack.dumps(session))
+
+    assert isinstance(loaded["teamRoles"], pack.LazyMap)
+    assert not loaded["teamRoles"].loaded
+    assert loaded["userRole"] == "coach"
+
+    # Untouched maps are written back as they are
+    assert pack.dumps(loaded) == pack.dumps(session)
+
+    loaded["teamRoles"]["500"] = "team_manager"
+    reloaded = pack.loads(pack.dumps(loaded))
+    assert reloaded["teamRoles"]["500"] == "team_manager"
+    assert len(reloaded["teamRoles"]) == 501
+
+def test_binary_mode_reads_json_values(binary_mode, monkeypatch):
+    session = _session(3)
+    monkeypatch.setattr(pack, "MODE", "json")
+    packed = pack.dumps(session).encode("utf-8")
+    monkeypatch.setattr(pack, "MODE", "binary")
+
+    assert pack.loads(packed) == session
+
+def test_binary_sessions(binary_mode, client_factory, credentials):
+    client = client_factory()
+    client.login(credentials)
+
+    assert client.get("/user/info").status_code == 200
+
+    client.logout()
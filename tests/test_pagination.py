@@ -0,0 +1,52 @@
+import pytest
+
+from main import app
+from database import db
+from model.Roles import TeamRole
+from model.Team import Team, TeamMember
+from model.User import User
+
+@pytest.fixture(scope="module")
+def teams(team_id):
+    """Adds four more teams and every other user as member of the team"""
+    with app.app_context():
+        db.session.add_all([Team(name="Team %d" % i) for i in range(1, 5)])
+        members = {member.user_id for member in TeamMember.query.filter_by(team_id=team_id)}
+        db.session.add_all([TeamMember(team_id=team_id, user=user, role=TeamRole.MEMBER) for user in User.query.all() if user.id not in members])
+        db.session.commit()
+
+def _pages(client, path, key, limit):
+    items = []
+    cursor = None
+    while True:
+        query = {"limit": limit}
+        if cursor is not None:
+            query["cursor"] = cursor
+        r = client.get(path, query_string=query)
+        assert r.status_code == 200
+        assert len(r.json[key]) <= limit
+        items += r.json[key]
+        cursor = r.json.get("next_cursor")
+        if cursor is None:
+            return items
+
+def test_list_teams_pages(teams, admin_client, team_id):
+    teams = admin_client.get("/team").json["teams"]
+    assert len(teams) == 5
+    assert "next_cursor" not in admin_client.get("/team").json
+
+    assert _pages(admin_client, "/team", "teams", 2) == teams
+    assert _pages(admin_client, "/team", "teams", 5) == teams
+
+def test_list_members_pages(teams, admin_client, team_id):
+    path = "/team/%d/members" % team_id
+    members = admin_client.get(path).json["members"]
+    assert len(members) == 4
+    assert [int(m["id"]) for m in members] == sorted(int(m["id"]) for m in members)
+
+    assert _pages(admin_client, path, "members", 1) == members
+    assert _pages(admin_client, path, "members", 3) == members
+
+@pytest.mark.parametrize("query", [{"limit": 0}, {"limit": "ten"}, {"limit": 100000}, {"cursor": "abc"}])
+def test_bad_page_args(teams, admin_client, team_id, query):
+    assert admin_client.get("/team", query_string=query).status_code == 400
@@ -0,0 +1,32 @@
+import pytest
+
+from main import app
+from database import db
+from model.Roles import SystemRole, TeamRole
+from model.Team import Team, TeamMember
+from model.User import User
+
+@pytest.fixture(scope="module")
+def teams(tempdb):
+    """IDs of teams by number of members"""
+    with app.app_context():
+        users = [User(mail="member%d@fableplus.com" % i, role=SystemRole.PARTICIPANT) for i in range(50)]
+        teams = {size: Team(name="%d members" % size) for size in (1, 10, 50)}
+        db.session.add_all(users + list(teams.values()))
+        for size, team in teams.items():
+            db.session.add_all([TeamMember(team=team, user=user, role=TeamRole.MEMBER) for user in users[:size]])
+        db.session.commit()
+        return {size: team.id for size, team in teams.items()}
+
+@pytest.mark.parametrize("path", ["/team/%d", "/team/%d/members"])
+def test_team_reads_have_constant_query_count(teams, admin_client, count_queries, path):
+    counts = {}
+    for size, team_id in teams.items():
+        with count_queries() as queries:
+            r = admin_client.get(path % team_id)
+        assert r.status_code == 200
+        assert len(r.json["members"]) == size
+        counts[size] = len(queries)
+
+    assert counts[1] == counts[10] == counts[50]
+    assert counts[1] <= 3
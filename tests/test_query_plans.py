@@ -0,0 +1,131 @@
+"""
+Runs EXPLAIN for the statements of the controller queries and fails if a table is scanned in full.
+Runs on SQLite, and on PostgreSQL if POSTGRES_TEST_URI is set.
+"""
+
+import os
+import re
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+from flask import g
+from sqlalchemy import event
+
+from main import app
+from database import db
+from setup import mock_data
+from model.Roles import SystemRole, TeamRole
+from model.Team import Team, TeamMember
+from model.User import User
+from modules.export import controller as export_controller
+from modules.team import controller as team_controller
+from modules.user import controller as user_controller
+from util import auth
+
+POSTGRES_URI = os.environ.get("POSTGRES_TEST_URI")
+
+_FULL_SCANS = {
+    "sqlite": re.compile(r"^SCAN (?!CONSTANT ROW)(\S+)( AS \S+)?$"),
+    "postgresql": re.compile(r"Seq Scan on (\S+)")
+}
+
+@pytest.fixture(scope="module", params=["sqlite", "postgresql"])
+def dialect(request, tempdb):
+    if request.param == "sqlite":
+        yield "sqlite"
+        return
+    if POSTGRES_URI is None:
+        pytest.skip("POSTGRES_TEST_URI is not set")
+
+    engine = sqlalchemy.create_engine(POSTGRES_URI)
+    with app.app_context():
+        engines = db.engines
+        default = engines[None]
+        engines[None] = engine
+        try:
+            db.drop_all()
+            db.create_all()
+            mock_data()
+            yield "postgresql"
+        finally:
+            db.session.remove()
+            db.drop_all()
+            engines[None] = default
+            engine.dispose()
+
+@pytest.fixture(scope="module")
+def ids(dialect):
+    with app.app_context():
+        coach = User.query.filter_by(mail="coach@fableplus.com").one()
+        member = User.query.filter_by(mail="user@fableplus.com").one()
+        team = Team(name="Planned")
+        db.session.add(team)
+        db.session.add(TeamMember(team=team, user=coach, role=TeamRole.MANAGER))
+        db.session.add(TeamMember(team=team, user=member, role=TeamRole.MEMBER))
+        db.session.commit()
+        return {"coach": coach.id, "member": member.id, "team": team.id}
+
+def _session(ids, role="coach"):
+    user_id = ids["coach"] if role == "coach" else ids["member"]
+    return {"userID": user_id, "userRole": role, "teamRoles": {str(ids["team"]): TeamRole.MANAGER.value}}
+
+def _team(ids):
+    return db.session.get(Team, ids["team"])
+
+QUERIES = {
+    "get_team_by_id": lambda ids: team_controller.get_team_by_id(ids["team"]),
+    "get_user_teams": lambda ids: team_controller.get_user_teams(limit=10),
+    "get_user_teams_by_role": lambda ids: team_controller.get_user_teams(restrict_to_role=TeamRole.MANAGER, limit=10),
+    "get_user_teams_any_role": lambda ids: team_controller.get_user_teams(restrict_to_role=None, limit=10),
+    "get_team_members": lambda ids: team_controller.get_team_members(_team(ids), limit=10),
+    "add_team_members": lambda ids: team_controller.add_team_members(_team(ids), [{"mail": "user@fableplus.com", "role": "team_reader"}]),
+    "remove_team_members": lambda ids: team_controller.remove_team_members(_team(ids), ["user@fableplus.com"]),
+    "get_user_by_id": lambda ids: user_controller.get_user_by_id(ids["member"]),
+    "get_users_by_mail": lambda ids: user_controller.get_users_by_mail(["user@fableplus.com", "unknown@fableplus.com"]),
+    "update_user": lambda ids: user_controller.update_user(user_controller.get_user_by_id(ids["coach"]), name="Planned Coach"),
+    "start_session": lambda ids: auth.start_session(ids["coach"], SystemRole.USER),
+    "export_users": lambda ids: list(export_controller.export_users(datetime(2020, 1, 1))),
+    "export_teams": lambda ids: list(export_controller.export_teams(datetime(2020, 1, 1))),
+    "export_team_members": lambda ids: list(export_controller.export_team_members(datetime(2020, 1, 1)))
+}
+
+def _run(ids, query):
+    """Runs a controller query, returns the statements it executed with their parameters"""
+    statements = []
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    with app.test_request_context():
+        g.session = _session(ids)
+        engine = db.engine
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            QUERIES[query](ids)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+    return statements
+
+def _plan(dialect, statement, parameters):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            if dialect == "sqlite":
+                rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+                return [row[-1] for row in rows]
+            # Tables of a test are small enough for sequential scans to win, unless nothing else is possible
+            connection.exec_driver_sql("SET enable_seqscan = off")
+            return [row[0] for row in connection.exec_driver_sql("EXPLAIN " + statement, parameters)]
+
+@pytest.mark.parametrize("query", sorted(QUERIES))
+def test_no_full_table_scans(dialect, ids, query):
+    statements = [
+        (statement, parameters) for statement, parameters in _run(ids, query)
+        if statement.lstrip().split(" ", 1)[0].upper() in ("SELECT", "UPDATE", "DELETE")
+    ]
+    assert statements
+
+    for statement, parameters in statements:
+        plan = _plan(dialect, statement, parameters)
+        scans = [line for line in plan if _FULL_SCANS[dialect].search(line)]
+        assert not scans, "Full table scan in %s:\n%s\n%s" % (query, statement, "\n".join(plan))
@@ -0,0 +1,89 @@
+from util import RedisAdapter
+
+def test_adapter_is_shared():
+    first = RedisAdapter.get_adapter("sessions")
+    second = RedisAdapter.get_adapter("sessions")
+
+    assert first is second
+    assert first.db.connection_pool is RedisAdapter.get_pool()
+
+def test_adapters_share_pool():
+    sessions = RedisAdapter.get_adapter("sessions")
+    other = RedisAdapter.get_adapter("test_other")
+
+    assert sessions is not other
+    assert sessions.db.connection_pool is other.db.connection_pool
+
+def test_pool_reset_after_fork():
+    adapter = RedisAdapter.get_adapter("sessions")
+
+    RedisAdapter._reset_after_fork()
+
+    assert RedisAdapter.get_adapter("sessions") is not adapter
+
+def test_ttl_is_kept_and_slid():
+    adapter = RedisAdapter.get_adapter("test_ttl")
+    key = adapter.var_prefix + "token"
+
+    adapter.set("token", {"a": 1}, ttl=100)
+    adapter.client("token").expire(key, 50)
+
+    # Rewriting a value must not drop its expiration
+    adapter.set("token", {"a": 2})
+    assert 0 < adapter.client("token").ttl(key) <= 50
+
+    # Reading with a TTL slides the expiration
+    assert adapter.get("token", ttl=100) == {"a": 2}
+    assert adapter.client("token").ttl(key) > 50
+
+    adapter.unset("token")
+
+def test_iterate_in_batches():
+    adapter = RedisAdapter.get_adapter("test_iterate")
+    values = {f"key{i}": {"i": i} for i in range(25)}
+    for key, value in values.items():
+        adapter.set(key, value, ttl=60)
+
+    assert dict(adapter.iterate(batch_size=4)) == values
+    assert adapter.list() == values
+    assert set(adapter.iterate_keys(batch_size=4)) == set(values)
+
+    for key in values:
+        adapter.unset(key)
+    assert list(adapter.iterate()) == []
+
+def test_exists_for_expiring_keys():
+    adapter = RedisAdapter.get_adapter("test_exists")
+
+    adapter.set("token", {"a": 1}, ttl=60)
+    assert adapter.exists("token")
+
+    # Simulates the expiration, the key list still holds the key
+    adapter.client("token").delete(adapter.var_key("token"))
+    assert adapter.client("token").sismember(adapter.keylist_key, "token")
+    assert not adapter.exists("token")
+
+def test_reap_drops_expired_keys(monkeypatch):
+    adapter = RedisAdapter.get_adapter("test_reap")
+    # Approximates MEMORY USAGE, which the test server may not support
+    monkeypatch.setattr(adapter, "_memory_usage", lambda node, key: 10 * node.scard(key))
+    for i in range(10):
+        adapter.set(f"key{i}", {"i": i}, ttl=60, indexes=["user_1"])
+    for i in range(0, 10, 2):
+        adapter.client(f"key{i}").delete(adapter.var_key(f"key{i}"))
+
+    # Every node holds its own part of the index
+    index_parts = sum(node.exists(adapter.index_key("user_1")) for node in adapter.nodes)
+    stats = adapter.reap(batch_size=3)
+
+    live = {f"key{i}" for i in range(1, 10, 2)}
+    assert stats["keys"] == 10
+    assert stats["keys_removed"] == 5
+    assert stats["indexes"] == index_parts
+    assert stats["index_entries_removed"] == 5
+    assert stats["bytes_reclaimed"] == 100
+    assert {key.decode("ascii") for node in adapter.nodes for key in node.smembers(adapter.keylist_key)} == live
+    assert set(adapter.index_members("user_1")) == live
+
+    adapter.unset_many(live, drop_indexes=["user_1"])
+    assert adapter.reap()["keys"] == 0
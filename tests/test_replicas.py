@@ -0,0 +1,116 @@
+import os
+import shutil
+import uuid
+from tempfile import mkstemp
+
+import pytest
+import sqlalchemy
+from flask import g
+from sqlalchemy import update
+
+import config
+from main import app
+from database import db
+from model.Team import Team
+from model.User import User
+from util import replicas
+
+@pytest.fixture(scope="module")
+def replica(team_id):
+    """Copies the primary database into a second SQLite file, which serves as replica"""
+    handler, path = mkstemp(suffix=".db")
+    os.close(handler)
+    with app.app_context():
+        db.session.remove()
+        shutil.copyfile(db.engines[None].url.database, path)
+        engine = sqlalchemy.create_engine("sqlite:///" + path)
+        db.engines[replicas.bind_key(0)] = engine
+
+        # Changed on the primary only, so reads from the replica are recognizable
+        with db.engines[None].begin() as connection:
+            connection.execute(update(Team).where(Team.id == team_id).values(name="Primary"))
+
+    yield engine
+
+    with app.app_context():
+        del db.engines[replicas.bind_key(0)]
+    engine.dispose()
+    replicas.reset()
+    os.remove(path)
+
+@pytest.fixture(scope="module")
+def coach(client_factory, credentials, replica):
+    client = client_factory()
+    client.login(credentials)
+    yield client
+    client.logout()
+
+def _read(team_id):
+    return db.session.get(Team, team_id).name
+
+def _name(team_id, method="GET", read=_read):
+    with app.test_request_context(method=method):
+        return read(team_id)
+
+def test_writes_without_replicas(tempdb):
+    user_id = str(uuid.uuid4())
+    with app.test_request_context(method="PATCH"):
+        g.session = {"userID": user_id}
+        db.session.add(Team(name="Unreplicated"))
+        db.session.commit()
+        assert "db_wrote" not in g
+    with app.app_context():
+        assert replicas._writes().get(user_id) is None
+
+def test_reads_by_request_method(team_id, replica):
+    assert _name(team_id, "GET") == "Team"
+    assert _name(team_id, "HEAD") == "Team"
+    assert _name(team_id, "POST") == "Primary"
+    with app.app_context():
+        assert _read(team_id) == "Primary"
+
+def test_annotations(team_id, replica):
+    assert _name(team_id, "POST", replicas.replica_reads(_read)) == "Team"
+    assert _name(team_id, "GET", replicas.primary_reads(_read)) == "Primary"
+
+def test_read_your_writes(coach, team_id, monkeypatch):
+    r = coach.get("/team/%d" % team_id)
+    assert r.json["name"] == "Team"
+
+    r = coach.patch("/team/%d" % team_id, json={"name": "Renamed"})
+    assert r.status_code == 200
+    # The time of the write is kept apart from the session, which stays unchanged
+    assert "X-Session-Token" not in r.headers
+    with app.app_context():
+        user_id = User.query.filter_by(mail="coach@fableplus.com").one().id
+        assert replicas._writes().get(user_id) is not None
+    r = coach.get("/team/%d" % team_id)
+    assert r.json["name"] == "Renamed"
+
+    # Once the window is over, the session reads from the replica again
+    monkeypatch.setattr(config, "DB_REPLICA_STICKY_TIME", 0)
+    r = coach.get("/team/%d" % team_id)
+    assert r.json["name"] == "Team"
+
+def test_unhealthy_replica(coach, team_id, replica, monkeypatch):
+    monkeypatch.setattr(config, "DB_REPLICA_STICKY_TIME", 0)
+    broken = sqlalchemy.create_engine("sqlite:///file:/nonexistent/replica.db?mode=ro&uri=true")
+    failures = replicas.failures.value(replica=replicas.bind_key(0))
+    with app.app_context():
+        db.engines[replicas.bind_key(0)] = broken
+    try:
+        r = coach.get("/team/%d" % team_id)
+        assert r.status_code == 200
+        assert r.json["name"] == "Renamed"
+        assert replicas.failures.value(replica=replicas.bind_key(0)) == failures + 1
+
+        # Not checked again before the check interval is over
+        coach.get("/team/%d" % team_id)
+        assert replicas.failures.value(replica=replicas.bind_key(0)) == failures + 1
+    finally:
+        with app.app_context():
+            db.engines[replicas.bind_key(0)] = replica
+        broken.dispose()
+
+    r = coach.get("/team/%d" % team_id)
+    assert r.json["name"] == "Team"
@@ -0,0 +1,76 @@
+import pytest
+
+import config
+from main import app
+from util import metrics, response_validation
+
+@pytest.fixture
+def sampled(monkeypatch):
+    monkeypatch.setattr(config, "RESPONSE_VALIDATION_RATE", 1.0)
+    monkeypatch.setattr(config, "RESPONSE_VALIDATION_BUDGET", 1.0)
+    monkeypatch.setattr(response_validation, "_costs", {})
+
+def test_violations_are_counted(sampled):
+    violations = response_validation.violations.value(schema="team_info_resp", keyword="type")
+    checked = response_validation.checked.value(schema="team_info_resp")
+
+    with app.test_request_context():
+        response_validation.check("team_info_resp", {"name": "Team", "members": [{"id": "1", "mail": "a@b.com"}]})
+        # getTeam used to return integer member IDs
+        response_validation.check("team_info_resp", {"name": "Team", "members": [{"id": 1, "mail": "a@b.com"}]})
+
+    assert response_validation.checked.value(schema="team_info_resp") == checked + 2
+    assert response_validation.violations.value(schema="team_info_resp", keyword="type") == violations + 1
+
+def test_budget_and_sampling(sampled, monkeypatch):
+    skipped = response_validation.skipped.value(schema="team_list_resp")
+    checked = response_validation.checked.value(schema="team_list_resp")
+
+    with app.test_request_context():
+        monkeypatch.setattr(config, "RESPONSE_VALIDATION_BUDGET", 0.0)
+        response_validation.check("team_list_resp", {"teams": []})
+        assert response_validation.skipped.value(schema="team_list_resp") == skipped + 1
+
+        monkeypatch.setattr(config, "RESPONSE_VALIDATION_BUDGET", 1.0)
+        monkeypatch.setattr(config, "RESPONSE_VALIDATION_RATE", 0.0)
+        response_validation.check("team_list_resp", {"teams": []})
+
+    assert response_validation.checked.value(schema="team_list_resp") == checked
+
+def test_validation_resumes_after_expensive_response(sampled, monkeypatch):
+    monkeypatch.setattr(config, "RESPONSE_VALIDATION_BUDGET", 0.002)
+    # As measured for a team with a thousand members
+    response_validation._costs["team_list_resp"] = 0.039
+    skipped = response_validation.skipped.value(schema="team_list_resp")
+    checked = response_validation.checked.value(schema="team_list_resp")
+
+    for _ in range(10):
+        with app.test_request_context():
+            response_validation.check("team_list_resp", {"teams": []})
+
+    assert response_validation.skipped.value(schema="team_list_resp") == skipped + 5
+    assert response_validation.checked.value(schema="team_list_resp") == checked + 5
+
+def test_responses_are_validated(sampled, client_factory, credentials):
+    checked = response_validation.checked.value(schema="user_login_resp")
+    client = client_factory()
+    client.login(credentials)
+
+    assert response_validation.checked.value(schema="user_login_resp") == checked + 1
+
+    r = client.get("/static/metrics")
+    assert r.status_code == 200
+    assert 'response_validation_checked_total{schema="user_login_resp"}' in r.get_data(as_text=True)
+
+def test_metrics_token(unauthorized_client, monkeypatch):
+    monkeypatch.setattr(config, "METRICS_TOKEN", "secret")
+
+    assert unauthorized_client.get("/static/metrics").status_code == 403
+    assert unauthorized_client.get("/static/metrics", headers={"X-Metrics-Token": "secret"}).status_code == 200
+
+def test_render_escapes_labels():
+    counter = metrics.Counter("test_render_total", "Test counter", ["name"])
+    counter.inc(name='a "b"\n')
+    counter.inc(2, name='a "b"\n')
+
+    assert 'test_render_total{name="a \\"b\\"\\n"} 3' in metrics.render()
@@ -0,0 +1,124 @@
+import os
+
+import jsonschema
+import pytest
+import simplejson as json
+
+import config
+
+from util.schema import SchemaRegistry, SCHEMA_DIR, get_registry
+
+def test_all_schemas_are_loaded():
+    registry = get_registry()
+    names = {os.path.splitext(f)[0] for f in os.listdir(SCHEMA_DIR) if f.endswith(".json")}
+
+    assert set(registry.validators) == names
+    assert get_registry() is registry
+
+def test_errors_match_jsonschema():
+    registry = get_registry()
+    with open(os.path.join(SCHEMA_DIR, "user_login_req.json")) as schema_file:
+        schema = json.load(schema_file)
+
+    for payload in [{"mail": "test"}, {"mail": "no-mail", "password": "x"}, {"mail": "a@b.com", "password": ""}, {"mail": "a@b.com", "password": "x", "other": 1}]:
+        with pytest.raises(jsonschema.ValidationError) as expected:
+            jsonschema.validate(payload, schema, format_checker=jsonschema.FormatChecker())
+        with pytest.raises(jsonschema.ValidationError) as actual:
+            registry.validate("user_login_req", payload)
+        assert actual.value.message == expected.value.message
+
+    registry.validate("user_login_req", {"mail": "a@b.com", "password": "x"})
+
+def test_invalid_schema_fails_on_load(tmp_path):
+    (tmp_path / "broken_req.json").write_text('{"type": "object", "required": "mail"}')
+
+    with pytest.raises(jsonschema.SchemaError, match="broken_req.json"):
+        SchemaRegistry(str(tmp_path))
+
+def test_unknown_schema():
+    with pytest.raises(KeyError):
+        get_registry().get("missing_req")
+
+PAYLOADS = {
+    "user_login_req": [
+        {"mail": "a@b.com", "password": "x"}, {"mail": "a@b.com", "password": "x", "role": "coach"},
+        {"mail": "a@b.com"}, {"mail": "no-mail", "password": "x"}, {"mail": "a@b.com", "password": ""},
+        {"mail": "a@b.com", "password": 1}, {"mail": "a@b.com", "password": "x", "other": 1}, [], "mail"
+    ],
+    "team_member_add_req": [
+        {"members": []}, {"members": [{"mail": "a@b.com", "role": "coach"}, {"mail": "c@d.com"}]}, {},
+        {"members": [{"role": "coach"}]}, {"members": [{"mail": "a@b.com", "role": "owner"}]},
+        {"members": [{"mail": "a@b.com", "role": 1}]}, {"members": {"mail": "a@b.com"}}, {"members": [1]}
+    ],
+    "user_sessions_revoke_req": [
+        {"users": [1, "2"]}, {"users": []}, {"users": [1.5]}, {"users": [1.0]}, {"users": [True]}, {"users": "1"}, {}
+    ]
+}
+
+@pytest.fixture(scope="module")
+def compiled_registry(tmp_path_factory):
+    return SchemaRegistry(compiled=True, cache_dir=str(tmp_path_factory.mktemp("schema_cache")))
+
+def _cache_dir(registry):
+    return os.path.dirname(registry.checks["user_login_req"].__code__.co_filename)
+
+def test_all_schemas_are_compiled(compiled_registry):
+    assert set(compiled_registry.checks) == set(compiled_registry.validators)
+    assert len(os.listdir(_cache_dir(compiled_registry))) == len(compiled_registry.checks)
+
+def test_compiled_checks_match_jsonschema(compiled_registry):
+    registry = get_registry()
+    for name, payloads in PAYLOADS.items():
+        for payload in payloads:
+            valid = registry.get(name).is_valid(payload)
+            assert compiled_registry.checks[name](payload) == valid, (name, payload)
+
+            if not valid:
+                with pytest.raises(jsonschema.ValidationError) as expected:
+                    registry.validate(name, payload)
+                with pytest.raises(jsonschema.ValidationError) as actual:
+                    compiled_registry.validate(name, payload)
+                assert actual.value.message == expected.value.message
+
+def test_compiled_checks_are_cached(compiled_registry):
+    cache_dir = _cache_dir(compiled_registry)
+    path = compiled_registry.checks["user_login_req"].__code__.co_filename
+    with open(path) as cached:
+        source = cached.read()
+
+    reloaded = SchemaRegistry(compiled=True, cache_dir=cache_dir)
+    assert reloaded.checks["user_login_req"].__code__.co_filename == path
+    assert os.listdir(cache_dir) == os.listdir(_cache_dir(compiled_registry))
+
+    # Tampered files are rejected and regenerated
+    with open(path, "a") as cached:
+        cached.write("\ndef is_valid(instance):\n    return 'cached'\n")
+    reloaded = SchemaRegistry(compiled=True, cache_dir=cache_dir)
+    assert reloaded.checks["user_login_req"]({}) is False
+    with open(path) as cached:
+        assert cached.read() == source
+
+def test_compiled_checks_require_secret(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ENVIRONMENT", "live")
+    with pytest.raises(ValueError):
+        SchemaRegistry(compiled=True, cache_dir=str(tmp_path))
+
+    monkeypatch.setattr(config, "APP_SECRET", "live secret")
+    assert SchemaRegistry(compiled=True, cache_dir=str(tmp_path)).checks
+
+def test_cache_dir_must_be_private(tmp_path):
+    cache_dir = tmp_path / "shared"
+    cache_dir.mkdir()
+    os.chmod(cache_dir, 0o777)
+    with open(cache_dir / "planted.py", "w") as planted:
+        planted.write("raise RuntimeError()\n")
+
+    registry = SchemaRegistry(compiled=True, cache_dir=str(cache_dir))
+    assert registry.checks["user_login_req"]({}) is False
+    assert os.listdir(cache_dir) == ["planted.py"]
+
+    # Created with private permissions
+    private_dir = tmp_path / "private"
+    SchemaRegistry(compiled=True, cache_dir=str(private_dir))
+    assert os.stat(private_dir).st_mode & 0o777 == 0o700
+    assert len(os.listdir(private_dir)) == len(registry.checks)
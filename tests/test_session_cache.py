@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+import config
+from util import pack, session_cache
+from util.session_cache import SessionCache
+
+def test_cache_is_bounded():
+    cache = SessionCache(max_size=2, ttl=60)
+    cache.put("a", {"userID": 1})
+    cache.put("b", {"userID": 2})
+    cache.get("a")
+    cache.put("c", {"userID": 3})
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"userID": 1}
+
+def test_cache_entries_expire():
+    cache = SessionCache(max_size=10, ttl=0)
+    cache.put("a", {"userID": 1})
+
+    assert cache.get("a") is None
+
+def test_cached_sessions_are_copies():
+    cache = SessionCache(max_size=10, ttl=60)
+    cache.put("a", {"userID": 1, "teamRoles": {"1": "team_member"}})
+
+    cache.get("a")["teamRoles"]["2"] = "team_manager"
+
+    assert cache.get("a")["teamRoles"] == {"1": "team_member"}
+
+def test_cached_sessions_are_stored_as_copies():
+    cache = SessionCache(max_size=10, ttl=60)
+    session = {"userID": 1, "teamRoles": {"1": "team_member"}}
+    cache.put("a", session)
+
+    # Changed in place during a request, before anything was saved
+    session["teamRoles"]["2"] = "team_manager"
+
+    assert cache.get("a")["teamRoles"] == {"1": "team_member"}
+
+def test_cached_lazy_maps_stay_undecoded(monkeypatch):
+    monkeypatch.setattr(pack, "MODE", "binary")
+    team_roles = {str(i): "team_member" for i in range(pack.LAZY_MAP_THRESHOLD + 1)}
+    session = pack.loads(pack.dumps({"userID": 1, "teamRoles": team_roles}))
+    cache = SessionCache(max_size=10, ttl=60)
+
+    cache.put("a", session)
+    cached = cache.get("a")
+
+    assert not session["teamRoles"].loaded
+    assert isinstance(cached["teamRoles"], pack.LazyMap)
+    assert not cached["teamRoles"].loaded
+    assert cached["teamRoles"] == team_roles
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    monkeypatch.setattr(config, "SESSION_CACHE", True)
+    yield
+    session_cache.reset()
+
+def test_invalidation_through_pubsub(shared_cache, client_factory, credentials):
+    client = client_factory()
+    client.login(credentials)
+
+    assert client.get("/user/info").status_code == 200
+    cache = session_cache.get_cache()
+    assert cache.get(client.token) is not None
+
+    # Invalidation sent by another worker
+    session_cache.get_adapter(session_cache.SESSION_DB).publish(session_cache.INVALIDATION_CHANNEL, client.token)
+    for _ in range(50):
+        if cache.get(client.token) is None:
+            break
+        time.sleep(0.1)
+    assert cache.get(client.token) is None
+
+    assert client.get("/user/info").status_code == 200
+    token = client.token
+    client.logout()
+    assert cache.get(token) is None
+    client.token = token
+    assert client.get("/user/info").status_code == 401
@@ -0,0 +1,41 @@
+import pytest
+
+import config
+from util import session_store
+
+@pytest.fixture(params=["redis", "redis_hash", "memory"])
+def store_name(request, monkeypatch):
+    monkeypatch.setattr(config, "SESSION_STORE", request.param)
+    monkeypatch.setattr(session_store, "_stores", {})
+    return request.param
+
+def test_logout_everywhere(store_name, client_factory, credentials):
+    first = client_factory()
+    second = client_factory()
+    first.login(credentials)
+    second.login(credentials)
+
+    r = first.post("/user/logout/all")
+    assert r.status_code == 200
+    # Sessions left over by other tests are counted as well
+    assert r.json["revoked"] >= 2
+
+    assert first.get("/user/info").status_code == 401
+    assert second.get("/user/info").status_code == 401
+
+def test_admin_revokes_sessions(store_name, client_factory, credentials, admin_credentials):
+    user = client_factory()
+    user.login(credentials)
+    user_id = user.get("/user/info").json["id"]
+    admin = client_factory()
+    admin.login(admin_credentials)
+
+    r = user.post("/user/sessions/revoke", json={"users": [user_id]})
+    assert r.status_code == 403
+
+    r = admin.post("/user/sessions/revoke", json={"users": [user_id, "9999"]})
+    assert r.status_code == 200
+    assert r.json["revoked"] >= 1
+
+    assert user.get("/user/info").status_code == 401
+    assert admin.get("/team").status_code == 200
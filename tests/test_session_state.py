@@ -0,0 +1,38 @@
+from util.session import Session
+
+def _session(**kw):
+    session = Session({"userID": 1, "userRole": "coach", "teamRoles": {}})
+    session.update(kw)
+    session.mark_saved()
+    return session
+
+def test_unchanged_session_is_not_saved():
+    session = _session()
+
+    session["userRole"] = "coach"
+
+    assert not session.needs_save
+
+def test_field_change_marks_dirty():
+    session = _session()
+
+    session["userRole"] = "admin"
+
+    assert session.needs_save
+    session.mark_saved()
+    assert not session.needs_save
+
+def test_team_role_changes():
+    session = _session()
+
+    session.set_team_role(3, "team_manager")
+    assert session.needs_save
+    assert session["teamRoles"] == {"3": "team_manager"}
+
+    session.mark_saved()
+    session.set_team_role("3", "team_manager")
+    assert not session.needs_save
+
+    session.remove_team_role(3)
+    assert session.needs_save
+    assert session["teamRoles"] == {}
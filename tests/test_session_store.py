@@ -0,0 +1,221 @@
+import time
+import uuid
+
+import pytest
+
+import config
+import maintenance
+from main import app
+from database import db
+from model.Roles import TeamRole
+from model.Team import Team, TeamMember
+from model.User import User
+from util import pack, session_store
+from util.RedisAdapter import get_adapter
+from util.session import Session, SESSION_DB
+
+@pytest.fixture(params=["redis", "redis_hash", "memory", "signed"])
+def store_name(request, monkeypatch):
+    monkeypatch.setattr(config, "SESSION_STORE", request.param)
+    monkeypatch.setattr(config, "SESSION_REVOCATION_SHARED", False)
+    monkeypatch.setattr(session_store, "_stores", {})
+    return request.param
+
+@pytest.fixture
+def signed_store(monkeypatch):
+    monkeypatch.setattr(config, "SESSION_REVOCATION_SHARED", False)
+    return session_store.SignedTokenSessionStore()
+
+MEMBER_CREDENTIALS = {"mail": "coach2@fableplus.com", "password": "test123"}
+
+def _session(user_id=1):
+    return Session({"userID": user_id, "userRole": "coach", "clientIP": "127.0.0.1", "teamRoles": {"1": "team_member"}})
+
+def test_login_logout(store_name, client_factory, credentials):
+    client = client_factory()
+    client.login(credentials)
+
+    r = client.get("/user/info")
+    assert r.status_code == 200
+    assert r.json["mail"] == credentials["mail"]
+
+    token = client.token
+    client.logout()
+    client.token = token
+    assert client.get("/user/info").status_code == 401
+
+def test_update_user_sessions(store_name):
+    store = session_store.get_store()
+    token = store.create(_session())
+    other_token = store.create(_session(user_id=2))
+
+    store.update_user_sessions(1, team_roles={"2": "team_manager"})
+
+    session = store.load(token)
+    if store_name == "signed":
+        # Signed tokens can't be changed, their roles are reloaded on their next request instead
+        assert session.stale
+    else:
+        assert session["teamRoles"] == {"1": "team_member", "2": "team_manager"}
+    assert store.load(other_token)["teamRoles"] == {"1": "team_member"}
+
+def test_update_many_user_sessions(store_name):
+    store = session_store.get_store()
+    tokens = {user_id: store.create(_session(user_id=user_id)) for user_id in (1, 2, 3)}
+
+    store.update_many_user_sessions({1: {"2": "team_manager"}, 2: {"1": None}})
+
+    sessions = {user_id: store.load(token) for user_id, token in tokens.items()}
+    if store_name == "signed":
+        assert sessions[1].stale and sessions[2].stale
+    else:
+        assert sessions[1]["teamRoles"] == {"1": "team_member", "2": "team_manager"}
+        assert sessions[2]["teamRoles"] == {}
+    assert not sessions[3].stale
+    assert sessions[3]["teamRoles"] == {"1": "team_member"}
+
+def test_signed_token_tampering(signed_store):
+    store = signed_store
+    token = store.create(_session())
+    payload, signature = token.split(".")
+    forged = session_store._b64encode(session_store._b64decode(payload).replace(b'"coach"', b'"admin"'))
+
+    assert store.load(token)["userRole"] == "coach"
+    assert store.load(forged + "." + signature) is None
+    assert store.load("invalid_token") is None
+
+def test_signed_store_requires_secret(signed_store, monkeypatch):
+    monkeypatch.setattr(config, "ENVIRONMENT", "live")
+    with pytest.raises(ValueError):
+        signed_store.init()
+
+    monkeypatch.setattr(config, "APP_SECRET", "live secret")
+    signed_store.init()
+
+def test_signed_token_reissue(signed_store):
+    store = signed_store
+    session = _session()
+    token = store.create(session)
+    session.mark_saved()
+
+    session.set_team_role(2, "team_coach")
+    new_token = store.save(session)
+
+    assert store.load(token) is None
+    assert store.load(new_token)["teamRoles"]["2"] == "team_coach"
+
+def test_signed_tokens_are_refreshed_after_role_changes(monkeypatch, client_factory, credentials):
+    monkeypatch.setattr(config, "SESSION_STORE", "signed")
+    monkeypatch.setattr(session_store, "_stores", {})
+    with app.app_context():
+        team = Team(name="Signed")
+        db.session.add(team)
+        db.session.add(TeamMember(team=team, user=User.query.filter_by(mail="coach@fableplus.com").one(), role=TeamRole.MANAGER))
+        db.session.commit()
+        team_id = team.id
+
+    coach = client_factory()
+    coach.login(credentials)
+    devices = [client_factory(), client_factory()]
+    for device in devices:
+        device.login(MEMBER_CREDENTIALS)
+
+    r = coach.patch("/team/%d/members" % team_id, json={"members": [{"mail": MEMBER_CREDENTIALS["mail"]}]})
+    assert r.status_code == 200
+
+    # The member stays logged in on every device and gets a token with the new role
+    old_token = devices[0].token
+    for device in devices:
+        r = device.get("/user/info")
+        assert r.status_code == 200
+        claims = session_store.get_store().load(r.headers["X-Session-Token"])
+        assert claims["teamRoles"][str(team_id)] == TeamRole.MEMBER.value
+        assert not claims.stale
+
+    # Requests still in flight with the old token keep working
+    devices[0].token = old_token
+    assert devices[0].get("/user/info").status_code == 200
+
+def test_signed_revocations_are_looked_up(monkeypatch):
+    monkeypatch.setattr(config, "SESSION_REVOCATION_REFRESH", 60)
+    workers = [session_store.RevocationList(shared=True), session_store.RevocationList(shared=True)]
+    issued_at = time.time() - 1
+    # Unique IDs, the redis server outlives the test run
+    token_id, other_token_id, user_id, other_user_id = uuid.uuid4().hex, uuid.uuid4().hex, time.time_ns(), time.time_ns() + 1
+
+    assert workers[1].check(token_id, user_id, issued_at) is None
+    workers[0].revoke_token(token_id, time.time() + 60)
+    workers[0].refresh_users([other_user_id])
+    assert workers[0].check(token_id, user_id, issued_at) == session_store.REVOKED
+
+    # Other workers keep their results until they are refreshed
+    assert workers[1].check(token_id, user_id, issued_at) is None
+    monotonic = time.monotonic
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: monotonic() + 61)
+    assert workers[1].check(token_id, user_id, issued_at) == session_store.REVOKED
+    assert workers[1].check(other_token_id, other_user_id, issued_at) == session_store.STALE
+    assert workers[1].check(other_token_id, other_user_id, time.time() + 1) is None
+
+    # Every entry is a single key which expires along with the tokens it affects
+    ttls = workers[0].redis.ttl_many(["t_" + token_id, "r_%d" % other_user_id])
+    assert 0 < ttls["t_" + token_id] <= 61
+    assert 0 < ttls["r_%d" % other_user_id] <= config.SESSION_TTL + 1
+
+def test_hash_sessions_load_team_roles_lazily(monkeypatch):
+    monkeypatch.setattr(config, "SESSION_STORE", "redis_hash")
+    store = session_store.get_store()
+    session = _session()
+    token = store.create(session)
+
+    loaded = store.load(token)
+    assert loaded["userID"] == 1 and loaded["userRole"] == "coach"
+    assert not loaded["teamRoles"].loaded
+    assert loaded["teamRoles"] == {"1": "team_member"}
+
+    loaded.set_team_role(2, "team_coach")
+    loaded.remove_team_role(1)
+    loaded["userRole"] = "admin"
+    store.save(loaded)
+
+    teams_key = store.redis.var_key(token) + "_teams"
+    assert store.redis.client(token).hgetall(teams_key) == {b"2": b"team_coach"}
+    assert store.redis.client(token).ttl(teams_key) > 0
+    assert store.load(token)["userRole"] == "admin"
+
+    store.destroy(token)
+    assert store.load(token) is None
+    assert not store.redis.client(token).exists(teams_key)
+
+def _legacy_session(adapter, token, expire_date, ttl=None):
+    """Stores a session as written before sessions expired in redis, with an expireDate field"""
+    session = dict(_session(), sessionToken=token, clientIP="127.0.0.1", expireDate=expire_date)
+    adapter.client(token).set(adapter.var_key(token), pack.dumps(session), ex=ttl)
+
+def test_legacy_sessions(monkeypatch):
+    monkeypatch.setattr(config, "SESSION_STORE", "redis")
+    monkeypatch.setattr(session_store, "_stores", {})
+    adapter = get_adapter(SESSION_DB)
+    now = time.time()
+    _legacy_session(adapter, "legacy_expired", now - 60)
+    _legacy_session(adapter, "legacy_active", now + 600)
+    _legacy_session(adapter, "legacy_far", now + 600, ttl=int(now))
+    current = session_store.get_store().create(_session())
+
+    maintenance.expire_legacy_sessions(batch_size=2)
+
+    ttls = adapter.ttl_many(["legacy_expired", "legacy_active", "legacy_far", current])
+    assert ttls["legacy_expired"] == -2
+    assert 590 <= ttls["legacy_active"] <= 600
+    assert 590 <= ttls["legacy_far"] <= 600
+    assert ttls[current] <= config.SESSION_TTL
+
+def test_legacy_session_expired(unauthorized_client, monkeypatch):
+    monkeypatch.setattr(config, "SESSION_STORE", "redis")
+    monkeypatch.setattr(session_store, "_stores", {})
+    adapter = get_adapter(SESSION_DB)
+    _legacy_session(adapter, "legacy_request", time.time() - 60)
+
+    r = unauthorized_client.get("/user/info", headers={"Authorization": "Bearer legacy_request"})
+    assert r.status_code == 401
+    assert r.json["error"]["errorCode"] == 1102
+    assert not adapter.exists("legacy_request")
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+import redis
+
+from util import RedisAdapter, session_store
+from util.session import Session
+from util.structs import HashRing
+
+# Start additional redis-server processes on these ports to run the sharding tests locally
+SHARDS = os.environ.get("REDIS_TEST_SHARDS", "localhost:6379,localhost:6380,localhost:6381").split(",")
+
+@pytest.fixture
+def shards():
+    for address in SHARDS:
+        try:
+            redis.StrictRedis(connection_pool=RedisAdapter.get_pool(address)).ping()
+        except redis.ConnectionError:
+            pytest.skip("redis node %s is not running" % address)
+    return SHARDS
+
+def test_hash_ring_is_consistent():
+    ring = HashRing(["a", "b", "c"])
+    keys = [str(i) for i in range(1000)]
+    placement = {key: ring.get(key) for key in keys}
+
+    assert set(placement.values()) == {"a", "b", "c"}
+    assert HashRing(["c", "b", "a"]).get("42") == placement["42"]
+
+    # Only the keys of the removed node move
+    smaller = HashRing(["a", "b"])
+    assert all(smaller.get(key) == node for key, node in placement.items() if node != "c")
+
+def test_sharded_adapter(shards):
+    adapter = RedisAdapter.RedisAdapter("test_sharded", nodes=shards)
+    values = {f"key{i}": {"i": i} for i in range(30)}
+    for key, value in values.items():
+        adapter.set(key, value, ttl=60, indexes=["user_" + str(value["i"] % 2)])
+
+    assert all(node.scard(adapter.keylist_key) > 0 for node in adapter.nodes)
+    assert adapter.get("key3") == {"i": 3}
+    assert adapter.get_many(["key1", "key2", "missing"]) == {"key1": {"i": 1}, "key2": {"i": 2}, "missing": None}
+    assert adapter.list() == values
+    assert set(adapter.index_members("user_1")) == {key for key, value in values.items() if value["i"] % 2}
+
+    assert adapter.unset_many(adapter.index_members("user_0"), drop_indexes=["user_0"]) == 15
+    assert adapter.index_members("user_0") == []
+    assert adapter.unset_many(list(values), drop_indexes=["user_1"]) == 15
+    assert adapter.list() == {}
+
+def test_sharded_hash_store(shards, monkeypatch):
+    adapter = RedisAdapter.RedisAdapter("test_sharded_hashes", nodes=shards)
+    monkeypatch.setitem(RedisAdapter._adapters, "test_sharded_hashes", adapter)
+    store = session_store.RedisHashSessionStore("test_sharded_hashes")
+
+    tokens = [
+        store.create(Session({"userID": 7, "userRole": "coach", "clientIP": "127.0.0.1", "teamRoles": {"1": "team_member"}}))
+        for _ in range(12)
+    ]
+    assert len({adapter.ring.get(token) for token in tokens}) > 1
+
+    store.update_user_sessions(7, role="admin", team_roles={"2": "team_coach"})
+    for token in tokens:
+        session = store.load(token)
+        assert session["userRole"] == "admin"
+        assert session["teamRoles"] == {"1": "team_member", "2": "team_coach"}
+
+    assert store.destroy_user_sessions([7]) == len(tokens)
+    assert all(store.load(token) is None for token in tokens)
@@ -0,0 +1,85 @@
+import pytest
+import sqlalchemy
+
+from main import app
+from database import db
+from model.Roles import TeamRole
+from model.Team import Team, TeamMember
+from model.User import User
+from modules.team import controller
+from util import session_store
+
+@pytest.fixture(scope="module")
+def coach(client_factory, credentials, team_id):
+    client = client_factory()
+    client.login(credentials)
+    yield client
+    client.logout()
+
+def _members(team_id):
+    with app.app_context():
+        return {tm.user.mail: tm.role for tm in TeamMember.query.filter_by(team_id=team_id)}
+
+def test_add_members_in_bulk(coach, team_id, count_queries):
+    counts = []
+    for batch, size in enumerate((5, 100)):
+        members = [{"mail": "new%d-%d@fableplus.com" % (batch, i)} for i in range(size)]
+        with count_queries() as queries:
+            r = coach.patch("/team/%d/members" % team_id, json={"members": members})
+        assert r.status_code == 200
+        counts.append(len(queries))
+
+    # Queries don't depend on the number of members
+    assert counts[0] == counts[1]
+    members = _members(team_id)
+    assert len(members) == 107
+    assert members["new1-99@fableplus.com"] == TeamRole.MEMBER
+
+def test_add_existing_users_and_change_roles(team_id):
+    with app.test_request_context():
+        team = db.session.get(Team, team_id)
+        controller.add_team_members(team, [
+            {"mail": "user@fableplus.com"},
+            {"mail": "new0-0@fableplus.com", "role": "team_coach"},
+            {"mail": "new0-1@fableplus.com", "role": "team_reader"},
+            {"mail": "new0-1@fableplus.com", "role": "team_member"}
+        ], skip_access_check=True)
+
+    members = _members(team_id)
+    assert members["user@fableplus.com"] == TeamRole.MEMBER
+    assert members["new0-0@fableplus.com"] == TeamRole.COACH
+    assert members["new0-1@fableplus.com"] == TeamRole.MEMBER
+    with app.app_context():
+        assert User.query.filter_by(mail="new0-0@fableplus.com").count() == 1
+
+def test_remove_members_in_bulk(coach, team_id):
+    mails = ["new0-%d@fableplus.com" % i for i in range(5)] + ["unknown@fableplus.com"]
+    r = coach.delete("/team/%d/members" % team_id, query_string={"members": ",".join(mails)})
+    assert r.status_code == 200
+
+    members = _members(team_id)
+    assert not set(mails) & set(members)
+    assert "new1-0@fableplus.com" in members
+
+def test_sessions_are_updated_once_after_commit(team_id, monkeypatch):
+    calls = []
+    store = session_store.get_store()
+    monkeypatch.setattr(store, "update_many_user_sessions", lambda team_roles, current=None: calls.append(dict(team_roles)))
+    mails = ["new1-%d@fableplus.com" % i for i in range(10)]
+
+    with app.test_request_context():
+        team = db.session.get(Team, team_id)
+        controller.add_team_members(team, [{"mail": mail, "role": "team_coach"} for mail in mails], skip_access_check=True)
+    assert len(calls) == 1
+    assert len(calls[0]) == 10
+    assert all(roles == {str(team_id): "team_coach"} for roles in calls[0].values())
+
+    # Nothing changes in the sessions if the memberships aren't stored
+    calls.clear()
+    monkeypatch.setattr(db.session, "commit", lambda: (_ for _ in ()).throw(sqlalchemy.exc.OperationalError("COMMIT", {}, None)))
+    with app.test_request_context():
+        team = db.session.get(Team, team_id)
+        with pytest.raises(sqlalchemy.exc.OperationalError):
+            controller.add_team_members(team, [{"mail": mail, "role": "team_reader"} for mail in mails], skip_access_check=True)
+        db.session.rollback()
+    assert calls == []
@@ -0,0 +1,57 @@
+from flask import g
+
+from main import app
+from model.Roles import TeamRole
+from model.User import User
+from util import auth, session_store
+from util.RedisAdapter import get_adapter
+from util.session import Session, SESSION_DB
+
+def _index_members(user_id):
+    return set(get_adapter(SESSION_DB).index_members(session_store._user_index(user_id)))
+
+def test_user_index_follows_sessions(client_factory, credentials):
+    first = client_factory()
+    second = client_factory()
+    first.login(credentials)
+    second.login(credentials)
+
+    user_id = first.get("/user/info").json["id"]
+    assert {first.token, second.token} <= _index_members(user_id)
+
+    token = first.token
+    first.logout()
+    assert token not in _index_members(user_id)
+    assert second.token in _index_members(user_id)
+
+    second.logout()
+
+def test_refresh_only_touches_user_sessions(client_factory, credentials):
+    user_client = client_factory()
+    user_client.login(credentials)
+
+    with app.test_request_context():
+        user = User.query.filter_by(mail=credentials["mail"]).one()
+        g.session = Session({"userID": -1, "userRole": "admin", "sessionToken": "other", "teamRoles": {}})
+
+        auth.refresh_user_access(user, TeamRole.COACH, 42)
+        session = get_adapter(SESSION_DB).get(user_client.token)
+        assert session["teamRoles"]["42"] == TeamRole.COACH.value
+
+        auth.revoke_user_access(user, team_id=42)
+        session = get_adapter(SESSION_DB).get(user_client.token)
+        assert "42" not in session["teamRoles"]
+
+    user_client.logout()
+
+def test_expired_sessions_are_pruned(client_factory, credentials):
+    user_client = client_factory()
+    user_client.login(credentials)
+    user_id = user_client.get("/user/info").json["id"]
+
+    redis = get_adapter(SESSION_DB)
+    redis.client(user_client.token).delete(redis.var_prefix + user_client.token)
+
+    assert user_client.token not in session_store.get_store()._get_user_sessions(user_id)
+
+    assert user_client.token not in _index_members(user_id)
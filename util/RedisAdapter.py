@@ -1,66 +1,389 @@
-from typing import Dict, Any, Union
+import os
+import threading
+from typing import Dict, Any, Iterator, List, Tuple, Union
 
 import redis
 
 import config
 from util import pack
+from util.structs import HashRing
+
+# Process wide connection pools (one per node) and adapter registry. Both are
+# reset in forked children so that workers never share sockets with their parent process.
+_pools = {}
+_adapters = {}
+_registry_lock = threading.RLock()
+
+def _parse_address(address):
+    """Splits a `host[:port]` string into host and port"""
+    redis_address = address.split(":")
+    redis_host = redis_address[0]
+    if len(redis_address) > 1:
+        redis_port = int(redis_address[1])
+    else:
+        redis_port = 6379
+    return redis_host, redis_port
+
+def get_pool(address=None) -> redis.ConnectionPool:
+    """Returns the connection pool of the current process for a node, the first configured node by default"""
+    if address is None:
+        address = config.REDIS_NODES[0]
+    pool = _pools.get(address)
+    if pool is None:
+        with _registry_lock:
+            pool = _pools.get(address)
+            if pool is None:
+                redis_host, redis_port = _parse_address(address)
+                pool = redis.ConnectionPool(host=redis_host, port=redis_port, db=0, password=config.REDIS_PASSWORD, max_connections=config.REDIS_MAX_CONNECTIONS)
+                _pools[address] = pool
+    return pool
+
+def get_adapter(database) -> "RedisAdapter":
+    """Returns the shared adapter for the given logical database"""
+    adapter = _adapters.get(database)
+    if adapter is None:
+        with _registry_lock:
+            adapter = _adapters.get(database)
+            if adapter is None:
+                adapter = RedisAdapter(database)
+                _adapters[database] = adapter
+    return adapter
+
+def _reset_after_fork():
+    global _registry_lock
+    _pools.clear()
+    _adapters.clear()
+    _registry_lock = threading.RLock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def registered_databases():
+    """Returns the logical names of all databases registered for this app and environment"""
+    prefix = config.APP_ID + "_" + config.ENVIRONMENT + "_"
+    names = [name.decode("utf-8") for name in redis.StrictRedis(connection_pool=get_pool()).smembers("_dbs")]
+    return sorted(name[len(prefix):] for name in names if name.startswith(prefix))
+
+# Removes all members of KEYS[1] whose value (ARGV[1] + member) no longer
+# exists. Check and removal are atomic, so a concurrent write is never lost.
+_REAP_MEMBERS = """
+local removed = 0
+for i = 2, #ARGV do
+    if redis.call('EXISTS', ARGV[1] .. ARGV[i]) == 0 then
+        removed = removed + redis.call('SREM', KEYS[1], ARGV[i])
+    end
+end
+return removed
+"""
 
 class RedisAdapter(object):
-    """Creates and maintains a connection to the redis database"""
-    def __init__(self, database):
-        redis_address = config.REDIS.split(":")
-        redis_host = redis_address[0]
-        if len(redis_address) > 0:
-            redis_port = redis_address[1]
-        else:
-            redis_port = 6379
-        self.db = redis.StrictRedis(host=redis_host, port=redis_port, db=0, password=config.REDIS_PASSWORD)
+    """
+    Creates and maintains the connections to the redis nodes of a database.
+    Values are spread across the nodes by consistent hashing of their key.
+    Every node keeps its own key list and its own part of each secondary index,
+    covering the keys stored on it, so index reads are sent to all nodes.
+    Database wide state like the registry and channels lives on the first node.
+    """
+    def __init__(self, database, nodes=None):
+        nodes = nodes if nodes is not None else config.REDIS_NODES
+        self._clients = {address: redis.StrictRedis(connection_pool=get_pool(address)) for address in nodes}
+        self.nodes = list(self._clients.values())
+        self.ring = HashRing(self._clients)
+        self.db = self.nodes[0]
+
         database = config.APP_ID + "_" + config.ENVIRONMENT + "_" + str(database)
+        self.database = database
         self.databases_key = "_dbs"
-        self.db.sadd(self.databases_key, database)
 
         self.mgmt_prefix = database + "_m_"
         self.var_prefix = database + "_v_"
+        self.index_prefix = database + "_i_"
 
         self.lock_key = self.mgmt_prefix + "locks"
         self.keylist_key = self.mgmt_prefix + "keys"
+        self._reap_script = None
 
-        self.keylock = self.db.lock(self.keylist_key + "_lock")
+    def register(self):
+        """Registers the database name in the global database list"""
+        self.db.sadd(self.databases_key, self.database)
 
-    def set(self, key, value):
-        self.keylock.acquire()
-        try:
-            self.db.sadd(self.keylist_key, str(key))
-            self.db.set(self.var_prefix + str(key), pack.dumps(value))
-        finally:
-            self.keylock.release()
+    def var_key(self, key):
+        """Full redis key of a value"""
+        return self.var_prefix + str(key)
+
+    def index_key(self, index):
+        """Full redis key of a secondary index"""
+        return self.index_prefix + str(index)
+
+    def client(self, key) -> redis.StrictRedis:
+        """Returns the client of the node holding the given key"""
+        return self._clients[self.ring.get(str(key))]
+
+    def by_node(self, keys) -> Dict[redis.StrictRedis, List[str]]:
+        """Groups keys by the node holding them. Every node is included, even without keys."""
+        groups = {node: [] for node in self.nodes}
+        for key in keys:
+            groups[self.client(key)].append(str(key))
+        return groups
+
+    def pipeline(self, key, transaction=True):
+        """
+        Returns a pipeline on the node holding `key`, for callers that need to
+        combine commands not covered by this adapter
+        """
+        return self.client(key).pipeline(transaction=transaction)
+
+    def register_script(self, script):
+        """Registers a lua script, which can be called with `client=` set to a client or pipeline of any node"""
+        return self.db.register_script(script)
+
+    def set(self, key, value, ttl=None, indexes=()):
+        """
+        Stores a value. If `ttl` is given, the key expires after `ttl` seconds,
+        otherwise an already existing expiration is kept.
+        The key is also added to all given secondary indexes.
+        """
+        # All writes are sent as one atomic MULTI/EXEC block, no lock required
+        pipe = self.pipeline(key)
+        self._queue_set(pipe, key, value, ttl)
+        for index in indexes:
+            pipe.sadd(self.index_prefix + str(index), str(key))
+        pipe.execute()
+
+    def set_many(self, values, ttl=None):
+        """
+        Stores multiple values with a single round trip per node. If `ttl` is given,
+        the keys expire after `ttl` seconds, otherwise their expiration is kept.
+        """
+        for node, keys in self.by_node(values).items():
+            if keys:
+                pipe = node.pipeline()
+                for key in keys:
+                    self._queue_set(pipe, key, values[key], ttl)
+                pipe.execute()
+
+    def _queue_set(self, pipe, key, value, ttl=None):
+        pipe.sadd(self.keylist_key, str(key))
+        if ttl is not None:
+            pipe.set(self.var_prefix + str(key), pack.dumps(value), ex=int(ttl))
+        else:
+            # Never resurrect a key that expired in the meantime
+            pipe.set(self.var_prefix + str(key), pack.dumps(value), keepttl=True, xx=True)
 
     def expire(self, key, seconds):
-        self.db.expireat(self.var_prefix + str(key), seconds)
-        # Cannot provide key exist queries for expiring keys at the moment
-        self.db.srem(self.keylist_key, str(key))
+        # The key list entry is dropped by `reap` once the value is gone
+        self.client(key).expireat(self.var_prefix + str(key), seconds)
+
+    def ttl_many(self, keys) -> Dict[str, int]:
+        """Returns the remaining seconds to live of multiple keys, -1 for keys without expiration and -2 for missing keys"""
+        ttls = {}
+        for node, node_keys in self.by_node(keys).items():
+            if node_keys:
+                pipe = node.pipeline(transaction=False)
+                for key in node_keys:
+                    pipe.ttl(self.var_prefix + key)
+                ttls.update(zip(node_keys, pipe.execute()))
+        return ttls
 
-    def get(self, key) -> Union[Dict[Any, Any], None]:
-        raw_val = self.db.get(self.var_prefix + str(key))
+    def expire_many(self, ttls):
+        """Sets the expiration of multiple keys to the given number of seconds, with a single round trip per node"""
+        for node, node_keys in self.by_node(ttls).items():
+            if node_keys:
+                pipe = node.pipeline(transaction=False)
+                for key in node_keys:
+                    pipe.expire(self.var_prefix + key, int(ttls[key]))
+                pipe.execute()
+
+    def get(self, key, ttl=None) -> Union[Dict[Any, Any], None]:
+        """Reads a value. If `ttl` is given, the expiration is reset to `ttl` seconds in the same round trip"""
+        if ttl is not None:
+            raw_val = self.client(key).getex(self.var_prefix + str(key), ex=int(ttl))
+        else:
+            raw_val = self.client(key).get(self.var_prefix + str(key))
         if raw_val is not None:
             return pack.loads(raw_val)
         else:
             return None
 
-    def unset(self, key):
-        self.keylock.acquire()
-        try:
-            self.db.srem(self.keylist_key, str(key))
-            self.db.delete(self.var_prefix + str(key))
-        finally:
-            self.keylock.release()
+    def get_many(self, keys) -> Dict[str, Union[Dict[Any, Any], None]]:
+        """Reads multiple values with a single MGET per node, missing keys map to None"""
+        keys = [str(key) for key in keys]
+        raw_vals = {}
+        for node, node_keys in self.by_node(keys).items():
+            if node_keys:
+                raw_vals.update(zip(node_keys, node.mget([self.var_prefix + key for key in node_keys])))
+        return {
+            key: pack.loads(raw_vals[key]) if raw_vals[key] is not None else None for key in keys
+        }
+
+    def unset(self, key, indexes=()):
+        pipe = self.pipeline(key)
+        pipe.srem(self.keylist_key, str(key))
+        pipe.delete(self.var_prefix + str(key))
+        for index in indexes:
+            pipe.srem(self.index_prefix + str(index), str(key))
+        pipe.execute()
+
+    def unset_many(self, keys, drop_indexes=()):
+        """Deletes multiple keys and drops the given indexes as a whole, returns the number of deleted keys"""
+        deleted = 0
+        for node, node_keys in self.by_node(keys).items():
+            if not node_keys and not drop_indexes:
+                continue
+            pipe = node.pipeline()
+            if node_keys:
+                pipe.srem(self.keylist_key, *node_keys)
+                pipe.delete(*[self.var_prefix + key for key in node_keys])
+            if drop_indexes:
+                pipe.delete(*[self.index_prefix + str(index) for index in drop_indexes])
+            results = pipe.execute()
+            if node_keys:
+                deleted += results[1]
+        return deleted
+
+    def index_members_many(self, indexes):
+        """Returns the keys of multiple secondary indexes, fetched with a single round trip per node"""
+        members = []
+        for node in self.nodes:
+            pipe = node.pipeline(transaction=False)
+            for index in indexes:
+                pipe.smembers(self.index_prefix + str(index))
+            members.extend(k.decode("ascii") for node_members in pipe.execute() for k in node_members)
+        return members
+
+    def index_members_by_index(self, indexes) -> Dict[str, List[str]]:
+        """Returns the keys of each of multiple secondary indexes, fetched with a single round trip per node"""
+        indexes = [str(index) for index in indexes]
+        members = {index: [] for index in indexes}
+        for node in self.nodes:
+            pipe = node.pipeline(transaction=False)
+            for index in indexes:
+                pipe.smembers(self.index_prefix + index)
+            for index, node_members in zip(indexes, pipe.execute()):
+                members[index].extend(k.decode("ascii") for k in node_members)
+        return members
+
+    def index_members(self, index):
+        """Returns all keys of a secondary index"""
+        return self.index_members_many([index])
+
+    def index_remove(self, index, *keys):
+        """Removes keys from a secondary index"""
+        for node, node_keys in self.by_node(keys).items():
+            if node_keys:
+                node.srem(self.index_prefix + str(index), *node_keys)
 
     def exists(self, key):
-        return self.db.sismember(self.keylist_key, str(key))
+        # The key list may still contain expired keys, only the value itself is reliable
+        return self.client(key).exists(self.var_prefix + str(key)) > 0
+
+    def publish(self, channel, message):
+        """Publishes a message on a channel of this database"""
+        self.db.publish(self.mgmt_prefix + channel, message)
+
+    def subscribe(self, channel, handler, exception_handler=None):
+        """
+        Calls `handler` with every message published on the given channel.
+        Messages are received by a daemon thread, which is returned.
+        """
+        pubsub = self.db.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.mgmt_prefix + channel: lambda message: handler(message["data"].decode("ascii"))})
+        return pubsub.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=exception_handler)
+
+    def _scan(self, node, match, batch_size) -> Iterator[str]:
+        cursor = 0
+        while True:
+            cursor, raw_keys = node.scan(cursor, match=match, count=batch_size)
+            for raw_key in raw_keys:
+                yield raw_key.decode("ascii")
+            if cursor == 0:
+                break
+
+    def iterate_keys(self, batch_size=None) -> Iterator[str]:
+        """
+        Iterates over all keys using the non-blocking SCAN cursor, one node after the other.
+        As with SCAN itself, a key may be returned more than once.
+        """
+        if batch_size is None:
+            batch_size = config.REDIS_SCAN_BATCH_SIZE
+        for node in self.nodes:
+            for key in self._scan(node, self.var_prefix + "*", batch_size):
+                yield key[len(self.var_prefix):]
+
+    def iterate(self, batch_size=None) -> Iterator[Tuple[str, Dict[Any, Any]]]:
+        """
+        Iterates over all key value pairs with bounded memory usage.
+        Keys are scanned in batches of `batch_size` and each batch is fetched with a single MGET per node.
+        """
+        batch = []
+        for key in self.iterate_keys(batch_size):
+            batch.append(key)
+            if len(batch) >= (batch_size or config.REDIS_SCAN_BATCH_SIZE):
+                yield from self._fetch_batch(batch)
+                batch = []
+        if batch:
+            yield from self._fetch_batch(batch)
+
+    def _fetch_batch(self, keys):
+        for key, value in self.get_many(keys).items():
+            # Keys might have expired between SCAN and MGET
+            if value is not None:
+                yield key, value
 
     def list(self) -> Dict[str, Dict[Any, Any]]:
-        keys = [key[len(self.var_prefix):] for key in [k.decode("ascii") for k in self.db.keys(self.var_prefix + "*")]]
+        return dict(self.iterate())
 
-        return {
-            key: self.get(key) for key in keys
-        }
+    def _memory_usage(self, node, key) -> Union[int, None]:
+        """Memory used by a key, or None if the server can't report it"""
+        try:
+            return node.memory_usage(key) or 0
+        except redis.ResponseError:
+            return None
+
+    def _reap_set(self, node, set_key, batch_size):
+        """Incrementally removes members without a live value from a set, returns (scanned, removed)"""
+        if self._reap_script is None:
+            self._reap_script = self.register_script(_REAP_MEMBERS)
+        scanned = removed = 0
+        cursor = 0
+        while True:
+            cursor, members = node.sscan(set_key, cursor, count=batch_size)
+            if members:
+                scanned += len(members)
+                # Pipelines load the script on the node first, if it isn't cached there yet
+                pipe = node.pipeline(transaction=False)
+                self._reap_script(keys=[set_key], args=[self.var_prefix] + members, client=pipe)
+                removed += pipe.execute()[0]
+            if cursor == 0:
+                break
+        return scanned, removed
+
+    def reap(self, batch_size=None) -> Dict[str, Any]:
+        """
+        Drops key list and secondary index entries whose value expired or was deleted.
+        Sets are scanned incrementally in batches of `batch_size`, so the server is
+        never blocked for long. Returns statistics including the memory reclaimed,
+        which is None if the server doesn't support MEMORY USAGE.
+        """
+        if batch_size is None:
+            batch_size = config.REDIS_SCAN_BATCH_SIZE
+        stats = {"keys": 0, "keys_removed": 0, "indexes": 0, "index_entries_removed": 0, "bytes_reclaimed": 0}
+
+        for node in self.nodes:
+            set_keys = [self.keylist_key] + list(self._scan(node, self.index_prefix + "*", batch_size))
+            for set_key in dict.fromkeys(set_keys):
+                before = self._memory_usage(node, set_key) if stats["bytes_reclaimed"] is not None else None
+                scanned, removed = self._reap_set(node, set_key, batch_size)
+                if set_key == self.keylist_key:
+                    stats["keys"] += scanned
+                    stats["keys_removed"] += removed
+                else:
+                    # Every node holds its own part of an index, each part is counted
+                    stats["indexes"] += 1
+                    stats["index_entries_removed"] += removed
+
+                if before is None:
+                    stats["bytes_reclaimed"] = None
+                elif removed:
+                    stats["bytes_reclaimed"] += before - self._memory_usage(node, set_key)
+        return stats
@@ -0,0 +1,52 @@
+""" Static assets
+
+This module serves static files from memory. Every file is read once and
+compressed with all available encodings on startup, see `util.compression`.
+Responses carry an ETag derived from the content and may be cached by
+clients for `config.STATIC_MAX_AGE` seconds.
+"""
+
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, request
+
+import config
+from util import compression
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "static")
+
+class StaticAsset(object):
+    """A file held in memory, in its original form and pre-compressed with each encoding"""
+    def __init__(self, name, mimetype=None):
+        with open(os.path.join(STATIC_DIR, name), "rb") as asset_file:
+            data = asset_file.read()
+        self.mimetype = mimetype or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.etag = hashlib.sha1(data).hexdigest()[:20]
+
+        self.variants = {None: data}
+        if compression.is_compressible(self.mimetype):
+            for encoding in compression.available_encodings():
+                compressed = compression.compress(data, encoding, static=True)
+                if len(compressed) < len(data):
+                    self.variants[encoding] = compressed
+
+    def response(self) -> Response:
+        """Returns the variant of the asset the client accepts best, or a 304 response if the client's copy is current"""
+        encoding = compression.negotiate([encoding for encoding in self.variants if encoding is not None])
+
+        r = Response(mimetype=self.mimetype)
+        r.vary.add("Accept-Encoding")
+        r.set_etag(self.etag, weak=encoding is not None)
+        r.cache_control.public = True
+        r.cache_control.max_age = config.STATIC_MAX_AGE
+
+        if request.if_none_match.contains_weak(self.etag):
+            r.status_code = 304
+            return r
+
+        r.set_data(self.variants[encoding])
+        if encoding is not None:
+            r.content_encoding = encoding
+        return r
@@ -4,21 +4,23 @@ This module provides methods and decorators to handle authentication of
 requests.
 """
 
-from typing import Callable, Union
+from typing import Callable, Dict, Optional, Union
 
 from flask import request, g
 import time
-import uuid
 import hashlib
 import base64
 from functools import wraps
-from util.RedisAdapter import RedisAdapter
+from util.session import Session
+from util.session_store import get_store
+from util import replicas
 from error import *
 
 import config
 from model.Roles import OrgRole, SystemRole, TeamRole, ComparableOrderedStringEnum
 from model.Team import TeamMember
 from model.User import User
+from database import db
 from util import get_request_ip
 
 _public_paths = []
@@ -26,44 +28,57 @@ _public_paths = []
 def _get_request_ip():
     return get_request_ip()
 
+def init_sessions():
+    """Prepares the session store, called once on application startup"""
+    get_store().init()
+
+def _load_team_roles(user_id):
+    """Returns the team roles of a user, by team ID"""
+    return {str(tm.team_id): tm.role.value for tm in TeamMember.query.filter(TeamMember.user_id == user_id)}
+
+@replicas.primary_reads
+def _reload_roles(session):
+    """Replaces the outdated roles of a stale session with the current ones"""
+    user = db.session.get(User, session["userID"])
+    if user is None:
+        raise InvalidSessionError()
+    session["userRole"] = user.role.value
+    session["teamRoles"] = _load_team_roles(user.id)
+
 def start_session(user_id, user_role):
     """Starts a new session for the given user ID"""
-    token = str(uuid.uuid4())
-    if config.ENVIRONMENT == "dev":
-        # 12h tokens for dev environments
-        expireDate = time.time() + (60 * 60 * 12)
-    else:
-        # New sessions will expire after 30 minutes of inactivity
-        expireDate = time.time() + (60 * 30)
-    session = {
+    session = Session({
         "userID" : user_id,
         "userRole" : user_role.value,
-        "clientIP" : _get_request_ip(),
-        "expireDate" : expireDate,
-        "sessionToken" : token
-    }
+        "clientIP" : _get_request_ip()
+    })
 
-    # Load access roles
-    teamRoles = {}
-    tm_query = TeamMember.query.filter(TeamMember.user_id == user_id)
-    for tm in tm_query:
-        teamRoles[tm.team_id] = tm.role.value
+    session["teamRoles"] = _load_team_roles(user_id)
 
-    session["teamRoles"] = teamRoles
+    token = get_store().create(session)
+    session.mark_saved()
 
     g.session = session
-
-    redis = RedisAdapter("sessions")
-    redis.set(token, session)
-    redis.expire(token, int(session["expireDate"]))
     return token
 
 def destroy_session(session_id):
     """Destroys the given session"""
-    redis = RedisAdapter("sessions")
-    redis.unset(session_id)
+    if g.get("session") is not None and g.session["sessionToken"] == session_id:
+        get_store().destroy(session_id, g.session)
+    else:
+        get_store().destroy(session_id)
     g.session = None
 
+def destroy_user_sessions(user_ids):
+    """
+    Destroys all sessions of the given users at once.
+    Returns the number of destroyed sessions, if known to the session store.
+    """
+    destroyed = get_store().destroy_user_sessions(user_ids)
+    if g.get("session") is not None and str(g.session["userID"]) in [str(user_id) for user_id in user_ids]:
+        g.session = None
+    return destroyed
+
 def _get_token():
     """Read the authentication header and syntactically validate the token"""
     if "Authorization" in request.headers:
@@ -83,41 +98,40 @@ def authenticate(access_limit=None, set_session=True, token=False):
     elif request.method == "OPTIONS":
         return
     else:
-        redis = RedisAdapter("sessions")
         if not token:
             token = _get_token()
-        session = redis.get(token)
+        session = get_store().load(token)
+        if session is not None and session.get("expireDate", float("inf")) < time.time():
+            # Stored before sessions expired in redis, see maintenance.expire_legacy_sessions
+            get_store().destroy(token, session)
+            raise SessionExpiredError()
         if session is not None:
-            if session["expireDate"] > time.time():
-                if session["clientIP"] == _get_request_ip():
-                    if access_limit is not None:
-                        if type(access_limit) is not list:
-                            access_limit = [access_limit]
-                        if not any([r <= session["userRole"] for r in access_limit]):
-                            raise AccessDeniedError()
-                    # Reset expiration date for session
-                    if config.ENVIRONMENT == "dev":
-                        # 12h tokens for dev environments
-                        session["expireDate"] = time.time() + (60 * 60 * 12)
-                    else:
-                        # New sessions will expire after 30 minutes of inactivity
-                        session["expireDate"] = time.time() + (60 * 30)
-                    if set_session:
-                        g.session = session
-                else:
-                    raise ClientOriginViolation()
+            if session["clientIP"] == _get_request_ip():
+                if session.stale:
+                    _reload_roles(session)
+                if access_limit is not None:
+                    if type(access_limit) is not list:
+                        access_limit = [access_limit]
+                    if not any([r <= session["userRole"] for r in access_limit]):
+                        raise AccessDeniedError()
+                if set_session:
+                    g.session = session
             else:
-                destroy_session(token)
-                raise SessionExpiredError()
+                raise ClientOriginViolation()
         else:
+            # Expired sessions are removed by the store and are indistinguishable from invalid tokens
             raise InvalidSessionError()
 
 def save_session():
-    """Saves the current session state"""
-    if "session" in g and g.session is not None:
-        token = g.session["sessionToken"]
-        redis = RedisAdapter("sessions")
-        redis.set(token, g.session)
+    """
+    Saves the current session state if it changed.
+    Returns a new session token if the client has to replace its current one.
+    """
+    if "session" in g and g.session is not None and g.session.needs_save:
+        token = get_store().save(g.session)
+        g.session.mark_saved()
+        return token
+    return None
 
 def noauth(fn):
     """Decorator to disable authentication for a single path."""
@@ -243,34 +257,45 @@ def refresh_user_access(user: User, role: ComparableOrderedStringEnum, entity_id
     :type entity_id: int
     """
 
-    redis = RedisAdapter("sessions")
-    sessions = redis.list()
+    if isinstance(role, OrgRole):
+        return # Not part of minimal backend example
 
-    for key in sessions:
-        try:
-            if sessions[key]["userID"] == user.id:
-                user_session = sessions[key]
-                if isinstance(role, SystemRole):
-                    user_session["userRole"] = role.value
-                elif isinstance(role, OrgRole):
-                    continue # Not part of minimal backend example
-                elif isinstance(role, TeamRole):
-                    user_session["teamRoles"][entity_id] = role.value
-
-                redis.set(key, user_session)
-        except KeyError:
-            # Remove old session with invalid structure
-            redis.unset(key)
-
-    if g.session["userID"] == user.id:
+    current = g.session if g.get("session") is not None and g.session["userID"] == user.id else None
+    if isinstance(role, SystemRole):
+        get_store().update_user_sessions(user.id, role=role.value, current=current)
+    elif isinstance(role, TeamRole):
+        get_store().update_user_sessions(user.id, team_roles={str(entity_id): role.value}, current=current)
+
+    if current is not None:
         # Also update current session if affected.
-        # Otherwise Redis entry will get overridden
+        # Otherwise the stored session will get overridden
         if isinstance(role, SystemRole):
             g.session["userRole"] = role.value
-        elif isinstance(role, OrgRole):
-            pass # Not part of minimal backend example
         elif isinstance(role, TeamRole):
-            g.session["teamRoles"][entity_id] = role.value
+            g.session.set_team_role(entity_id, role.value)
+
+def refresh_team_access(team_id: int, roles: Dict[int, Optional[TeamRole]]):
+    """
+    Changes the role in a team for all active sessions of many users at once.
+    Called after the change was committed, the roles are given by user ID and
+    a role of None revokes the access to the team.
+    """
+    if not roles:
+        return
+
+    current = g.session if g.get("session") is not None and g.session["userID"] in roles else None
+    get_store().update_many_user_sessions(
+        {user_id: {str(team_id): role.value if role is not None else None} for user_id, role in roles.items()},
+        current=current
+    )
+
+    if current is not None:
+        # Also update current session, otherwise the stored session will get overridden
+        role = roles[current["userID"]]
+        if role is not None:
+            current.set_team_role(team_id, role.value)
+        else:
+            current.remove_team_role(team_id)
 
 def revoke_user_access(user: User, team_id: int=None):
     """
@@ -284,20 +309,14 @@ def revoke_user_access(user: User, team_id: int=None):
     :type company_id: int, optional
     """
 
-    redis = RedisAdapter("sessions")
-    sessions = redis.list()
-
-    for key in sessions:
-        if sessions[key]["userID"] == user.id:
-            user_session = sessions[key]
-            if team_id is not None and team_id in user_session["teamRoles"]:
-                del user_session["teamRoles"][team_id]
+    if team_id is None:
+        return
 
-            redis.set(key, user_session)
+    current = g.session if g.get("session") is not None and g.session["userID"] == user.id else None
+    get_store().update_user_sessions(user.id, team_roles={str(team_id): None}, current=current)
 
-    if g.session["userID"] == user.id:
+    if current is not None:
         # Also update current session if affected.
-        # Otherwise Redis entry will get overridden
-        if team_id is not None and team_id in g.session["teamRoles"]:
-            del g.session["teamRoles"][team_id]
+        # Otherwise the stored session will get overridden
+        g.session.remove_team_role(team_id)
 
@@ -0,0 +1,96 @@
+""" Response compression
+
+This module compresses response bodies with the best encoding the client
+accepts. gzip is always available, brotli and zstd are used if the `brotli`
+or `zstandard` package is installed. Responses are compressed if their
+mimetype is compressible and their body is at least
+`config.COMPRESSION_MIN_SIZE` bytes long. Streamed responses, e.g. exports,
+are sent as they are.
+
+Compressed responses carry a weak ETag, the representation differs from the
+uncompressed one byte by byte, but not semantically. Conditional requests use
+weak comparison, so both match the same entity tag.
+"""
+
+import gzip
+from typing import List, Optional
+
+from flask import request
+
+import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_COMPRESSIBLE = {"application/json", "application/x-ndjson", "application/yaml", "application/javascript", "image/svg+xml"}
+
+def _gzip(data, level):
+    # No timestamp in the header, so the output only depends on the input
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+def _zstd(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+# Encodings in order of preference, with their levels for responses and for assets compressed once on startup
+_ENCODINGS = {}
+if brotli is not None:
+    _ENCODINGS["br"] = (_brotli, 4, 11)
+if zstandard is not None:
+    _ENCODINGS["zstd"] = (_zstd, 3, 19)
+_ENCODINGS["gzip"] = (_gzip, 6, 9)
+
+def available_encodings() -> List[str]:
+    """Returns the supported content encodings, most preferred first"""
+    return list(_ENCODINGS)
+
+def negotiate(encodings=None) -> Optional[str]:
+    """Returns the encoding of the given ones that the current request accepts best, or None for no encoding"""
+    if encodings is None:
+        encodings = available_encodings()
+    return request.accept_encodings.best_match(encodings)
+
+def compress(data, encoding, static=False) -> bytes:
+    """Compresses data with an encoding, with the highest level for static data"""
+    compressor, level, static_level = _ENCODINGS[encoding]
+    return compressor(data, static_level if static else level)
+
+def is_compressible(mimetype) -> bool:
+    return mimetype is not None and (mimetype.startswith("text/") or mimetype in _COMPRESSIBLE)
+
+def compress_response(r):
+    """Compresses a response if the client accepts it and it's worth it"""
+    if not config.COMPRESSION or r.status_code < 200 or r.status_code in (204, 206, 304):
+        return r
+    if r.direct_passthrough or r.is_streamed or "Content-Encoding" in r.headers or not is_compressible(r.mimetype):
+        return r
+    if "accept-encoding" in r.vary:
+        # The view negotiated the encoding already, e.g. for a pre-compressed asset
+        return r
+
+    r.vary.add("Accept-Encoding")
+    data = r.get_data()
+    if len(data) < config.COMPRESSION_MIN_SIZE:
+        return r
+    encoding = negotiate()
+    if encoding is None:
+        return r
+
+    compressed = compress(data, encoding)
+    if len(compressed) >= len(data):
+        return r
+    r.set_data(compressed)
+    r.content_encoding = encoding
+    etag, weak = r.get_etag()
+    if etag is not None and not weak:
+        r.set_etag(etag, weak=True)
+    return r
@@ -0,0 +1,92 @@
+""" Database engines
+
+This module applies the engine profile `config.DB_PROFILE` to the database
+engines. The pool settings of the profile are passed on engine creation,
+see `engine_options`, while the per-connection settings are applied by a
+connect hook installed with `configure`. The time spent waiting for a pooled
+connection is exported as the `db_pool_checkout_seconds` metric.
+"""
+
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+import config
+from util import metrics
+
+# Name of the primary database in metrics
+PRIMARY = "primary"
+
+_POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle", "pool_pre_ping")
+
+checkout_seconds = metrics.Histogram("db_pool_checkout_seconds", "Time spent waiting for a connection from the pool", ["bind"])
+
+class TimedQueuePool(QueuePool):
+    """Queue pool recording how long each checkout waits for a connection, including connecting if the pool grows"""
+    bind = PRIMARY
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super(TimedQueuePool, self)._do_get()
+        finally:
+            checkout_seconds.observe(time.perf_counter() - start, bind=self.bind)
+
+    def recreate(self):
+        pool = super(TimedQueuePool, self).recreate()
+        pool.bind = self.bind
+        return pool
+
+def get_profile(name=None) -> dict:
+    name = name or config.DB_PROFILE
+    if name not in config.DB_PROFILES:
+        raise ValueError("Unknown engine profile %s, expected one of %s" % (name, ", ".join(config.DB_PROFILES)))
+    return config.DB_PROFILES[name]
+
+def _is_memory(url) -> bool:
+    return url.get_backend_name() == "sqlite" and (url.database in (None, "", ":memory:") or url.query.get("mode") == "memory")
+
+def engine_options(uri, profile=None) -> dict:
+    """Returns the options for creating the engine of the given database"""
+    # In-memory SQLite databases live in a single connection, which can't be pooled
+    if _is_memory(make_url(uri)):
+        return {}
+    profile = get_profile(profile)
+    options = {option: profile[option] for option in _POOL_OPTIONS}
+    options["poolclass"] = TimedQueuePool
+    return options
+
+def _sqlite_connect(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in pragmas.items():
+                cursor.execute("PRAGMA %s = %s" % (pragma, value))
+        finally:
+            cursor.close()
+    return on_connect
+
+def _postgresql_connect(statement_timeout):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SET statement_timeout = %d" % int(statement_timeout * 1000))
+        finally:
+            cursor.close()
+        # The setting is kept for the lifetime of the connection, not just for the current transaction
+        dbapi_connection.commit()
+    return on_connect
+
+def configure(engine, bind=PRIMARY, profile=None):
+    """Installs the connect hook of the profile on the engine and labels its pool in metrics"""
+    profile = get_profile(profile)
+    if isinstance(engine.pool, TimedQueuePool):
+        engine.pool.bind = bind
+
+    backend = engine.url.get_backend_name()
+    if backend == "sqlite" and profile["sqlite_pragmas"]:
+        event.listen(engine, "connect", _sqlite_connect(profile["sqlite_pragmas"]))
+    elif backend == "postgresql" and profile["statement_timeout"] is not None:
+        event.listen(engine, "connect", _postgresql_connect(profile["statement_timeout"]))
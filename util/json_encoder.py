@@ -0,0 +1,72 @@
+""" JSON encoding of responses
+
+This module encodes response payloads to JSON bytes. The encoder is selected
+by `config.JSON_ENCODER`:
+
+- `orjson`: the orjson package, several times faster than the standard library
+- `json`: the standard library
+- `auto`: orjson if it is installed, the standard library otherwise (default)
+
+Both produce the same documents as flask's default encoder: keys are sorted,
+dates are HTTP dates and decimals, UUIDs and dataclasses are supported.
+"""
+
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+from typing import Any, Callable
+
+from werkzeug.http import http_date
+
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(o):
+    """Encodes the types flask supports in addition to the JSON types"""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError("Object of type %s is not JSON serializable" % type(o).__name__)
+
+def _dumps_json(obj) -> bytes:
+    return json.dumps(obj, default=_default, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+if orjson is not None:
+    # Dates are handed to `_default`, orjson would encode them as ISO 8601 strings
+    _ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+def _dumps_orjson(obj) -> bytes:
+    try:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        # e.g. integers exceeding 64 bit, which the standard library handles
+        return _dumps_json(obj)
+
+_ENCODERS = {
+    "json": _dumps_json,
+    "orjson": _dumps_orjson
+}
+
+def get_encoder() -> Callable[[Any], bytes]:
+    """Returns the encoder selected by `config.JSON_ENCODER`"""
+    name = config.JSON_ENCODER
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name == "orjson" and orjson is None:
+        raise RuntimeError("The orjson encoder requires the orjson package")
+    return _ENCODERS[name]
+
+def dumps(obj) -> bytes:
+    """Encodes an object to JSON bytes with the configured encoder"""
+    return get_encoder()(obj)
@@ -0,0 +1,102 @@
+""" Metrics
+
+This module defines process local metrics, which are exported in the
+Prometheus text format by the metrics route. Every worker process keeps its
+own values, so each worker has to be scraped separately.
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+_metrics = {}
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class _Metric(object):
+    """Base of all metrics, which are registered by their unique name"""
+    def __init__(self, name, description, labels=()):
+        if name in _metrics:
+            raise ValueError("Metric %s is already defined" % name)
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics[name] = self
+
+    def _key(self, labels) -> Tuple[str, ...]:
+        return tuple(str(labels[label]) for label in self.labels)
+
+class Counter(_Metric):
+    """Monotonically increasing value, optionally split by labels"""
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Returns (name, labels, value) of every exported series"""
+        with self._lock:
+            values = list(self._values.items())
+        return [(self.name, dict(zip(self.labels, key)), value) for key, value in sorted(values)]
+
+class Histogram(_Metric):
+    """Distribution of observed values, counted in cumulative buckets by their upper bounds"""
+    type = "histogram"
+
+    # Suited for durations in seconds
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.setdefault(key, [[0] * len(self.buckets), 0.0])
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        series = self._values.get(self._key(labels))
+        return sum(series[0]) if series is not None else 0
+
+    def sum(self, **labels):
+        series = self._values.get(self._key(labels))
+        return series[1] if series is not None else 0.0
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+
+        samples = []
+        for key, counts, total in sorted(values):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", dict(labels, le="+Inf" if bound == float("inf") else repr(float(bound))), cumulative))
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, cumulative))
+        return samples
+
+def render() -> str:
+    """Returns all metrics in the Prometheus text format"""
+    lines = []
+    for metric in _metrics.values():
+        lines.append("# HELP %s %s" % (metric.name, metric.description))
+        lines.append("# TYPE %s %s" % (metric.name, metric.type))
+        for name, labels, value in metric.samples():
+            if labels:
+                name += "{%s}" % ",".join("%s=\"%s\"" % (label, _escape(label_value)) for label, label_value in labels.items())
+            lines.append("%s %s" % (name, repr(float(value)) if isinstance(value, float) else value))
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,71 @@
 import json
 import pickle
 
-MODE = "json"
+import config
+from util.structs import LazyDict
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# One of "json", "pickle" or "binary". Pickle must only be used with trusted, unshared databases.
+MODE = config.PACK_MODE
+
+# First byte of every value packed in binary mode. Increase it whenever the binary layout changes.
+SCHEMA_VERSION = 1
+# Maps with more entries than this are packed separately and only decoded on first access
+LAZY_MAP_THRESHOLD = 32
+
+_LAZY_MAP_EXT = 1
+
+class LazyMap(LazyDict):
+    """A map that is decoded from its packed bytes on first access"""
+    def __init__(self, raw):
+        super(LazyMap, self).__init__(self._decode)
+        self._raw = raw
+
+    def _decode(self):
+        data = msgpack.unpackb(self._raw, raw=False, strict_map_key=False)
+        self._raw = None
+        return data
+
+    def copy(self):
+        """Returns a copy, without decoding the map if it wasn't accessed yet"""
+        if not self.loaded:
+            return LazyMap(self._raw)
+        return dict(self.data)
+
+def _pack_default(obj):
+    if isinstance(obj, LazyMap):
+        if not obj.loaded:
+            # Untouched maps are written back without decoding them
+            return msgpack.ExtType(_LAZY_MAP_EXT, obj._raw)
+        return _pack_value(obj.data)
+    raise TypeError("Object of type %s can not be packed" % type(obj).__name__)
+
+def _pack_value(value):
+    if isinstance(value, dict) and len(value) > LAZY_MAP_THRESHOLD:
+        return msgpack.ExtType(_LAZY_MAP_EXT, msgpack.packb(value, use_bin_type=True, default=_pack_default))
+    return value
+
+def _unpack_ext(code, data):
+    if code == _LAZY_MAP_EXT:
+        return LazyMap(data)
+    return msgpack.ExtType(code, data)
+
+def _dumps_binary(obj):
+    if msgpack is None:
+        raise RuntimeError("The binary pack mode requires the msgpack package")
+    if isinstance(obj, dict):
+        obj = {key: _pack_value(value) for key, value in obj.items()}
+    return bytes([SCHEMA_VERSION]) + msgpack.packb(obj, use_bin_type=True, default=_pack_default)
+
+def _loads_binary(string):
+    if string[0] != SCHEMA_VERSION:
+        # Values written before switching to the binary mode
+        return json.loads(string)
+    return msgpack.unpackb(memoryview(string)[1:], raw=False, strict_map_key=False, ext_hook=_unpack_ext)
 
 def dumps(obj):
     """Pack the value of the given parameter using the configured mode"""
@@ -9,6 +73,8 @@ def dumps(obj):
         return pickle.dumps(obj)
     elif MODE == "json":
         return json.dumps(obj)
+    elif MODE == "binary":
+        return _dumps_binary(obj)
     else:
         return obj
 
@@ -21,5 +87,7 @@ def loads(string):
         return pickle.loads(string)
     elif MODE == "json":
         return json.loads(string)
+    elif MODE == "binary":
+        return _loads_binary(string)
     else:
         return string
@@ -0,0 +1,50 @@
+""" Keyset pagination
+
+List routes return their items one page at a time, ordered by ID. The cursor
+is the ID of the last item of the previous page, so every page is a range
+scan on the ID column, which costs the same no matter how deep it is. Pages
+are sized by the `limit` query parameter, up to `config.PAGE_SIZE_MAX`.
+"""
+
+from typing import List, Optional, Tuple
+
+from flask import request
+
+import config
+from error import BadParameterError
+
+def page_args() -> Tuple[int, Optional[int]]:
+    """Returns the page size and the cursor of the current request"""
+    try:
+        limit = int(request.args.get("limit", config.PAGE_SIZE))
+    except ValueError:
+        raise BadParameterError("limit must be an integer")
+    if not 1 <= limit <= config.PAGE_SIZE_MAX:
+        raise BadParameterError("limit must be between 1 and %d" % config.PAGE_SIZE_MAX)
+
+    cursor = request.args.get("cursor")
+    if cursor is not None:
+        try:
+            cursor = int(cursor)
+        except ValueError:
+            raise BadParameterError("invalid cursor")
+
+    return limit, cursor
+
+def paginate(query, column, limit=None, cursor=None) -> Tuple[List, Optional[str]]:
+    """
+    Returns the items of a query following the cursor, ordered by `column`, and the cursor of the next page.
+    The next cursor is None on the last page. Without a limit, all items are returned.
+    """
+    if cursor is not None:
+        query = query.filter(column > cursor)
+    query = query.order_by(column)
+    if limit is None:
+        return query.all(), None
+
+    # One more item than requested tells whether there is a next page
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, str(getattr(items[-1], column.key))
@@ -0,0 +1,193 @@
+""" Read replicas
+
+This module routes the reads of a request to a read replica of the primary
+database. Replicas are configured as binds named `replica_<n>`, see
+`config.DB_REPLICAS`. Reads of GET and HEAD requests go to a replica, all
+other requests and every write use the primary. Views and controllers may
+override the routing with the `replica_reads` and `primary_reads`
+decorators.
+
+A user who wrote to the database reads from the primary for
+`config.DB_REPLICA_STICKY_TIME` seconds afterwards, so their own changes are
+visible even if the replicas lag behind. The time of the last write is kept
+in a short-lived redis key per user, apart from the session, and only while
+replicas are configured. Replicas are checked before use at most every
+`config.DB_REPLICA_CHECK_INTERVAL` seconds, unhealthy ones are skipped until
+their next check and without any healthy replica all reads go to the primary.
+"""
+
+import math
+import random
+import threading
+import time
+import weakref
+from functools import wraps
+
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event, text
+
+import config
+from util import log, metrics
+from util.RedisAdapter import get_adapter
+
+# Prefix of the bind keys of replicas
+BIND_PREFIX = "replica_"
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+# Name of the redis database holding the time of the last write of each user
+WRITES_DB = "replica_writes"
+
+_READ_METHODS = ("GET", "HEAD")
+
+failures = metrics.Counter("db_replica_failures_total", "Failed health checks and disconnects of read replicas", ["replica"])
+
+def bind_key(index):
+    return BIND_PREFIX + str(index)
+
+def binds(uris):
+    """Returns the SQLALCHEMY_BINDS entries for the given replica URIs"""
+    return {bind_key(i): uri for i, uri in enumerate(uris)}
+
+class _Health(object):
+    """Result of the latest health check of a replica engine"""
+    def __init__(self, key):
+        self.key = key
+        self.healthy = False
+        self.checked = None
+        self.lock = threading.Lock()
+
+    def failed(self, reason):
+        if self.healthy or self.checked is None:
+            log.warn("Read replica %s is unhealthy: %s" % (self.key, reason))
+        failures.inc(replica=self.key)
+        self.healthy = False
+        self.checked = time.monotonic()
+
+# Keyed by engine, so replacing an engine starts over with a new check
+_health = weakref.WeakKeyDictionary()
+_health_lock = threading.Lock()
+
+def _get_health(key, engine):
+    with _health_lock:
+        health = _health.get(engine)
+        if health is None:
+            health = _health[engine] = _Health(key)
+            event.listen(engine, "handle_error", lambda context: _handle_error(health, context))
+    return health
+
+def _handle_error(health, context):
+    # Statements on a replica failed because it went away, later requests use the other replicas until its next check
+    if context.is_disconnect:
+        health.failed(context.original_exception)
+
+def is_healthy(key, engine) -> bool:
+    """Returns whether the replica is usable, checks it again if its latest check is outdated"""
+    health = _get_health(key, engine)
+    if health.checked is not None and time.monotonic() - health.checked < config.DB_REPLICA_CHECK_INTERVAL:
+        return health.healthy
+
+    # Only one thread checks, the others go with the previous result meanwhile
+    if not health.lock.acquire(blocking=False):
+        return health.healthy
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        health.healthy = True
+        health.checked = time.monotonic()
+    except Exception as e:
+        health.failed(e)
+    finally:
+        health.lock.release()
+    return health.healthy
+
+def reset():
+    """Forgets the results of all health checks"""
+    with _health_lock:
+        for health in _health.values():
+            health.checked = None
+
+def _reads_from(target):
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kw):
+            previous = g.get("db_reads")
+            g.db_reads = target
+            try:
+                return f(*args, **kw)
+            finally:
+                g.db_reads = previous
+        return wrapper
+    return decorator
+
+def replica_reads(f):
+    """Decorator to read from a replica during the call of a view or controller, regardless of the request method"""
+    return _reads_from(REPLICA)(f)
+
+def primary_reads(f):
+    """Decorator to read from the primary during the call of a view or controller"""
+    return _reads_from(PRIMARY)(f)
+
+def _replica_keys(engines):
+    return [key for key in engines if key is not None and key.startswith(BIND_PREFIX)]
+
+_registered = False
+
+def _writes():
+    global _registered
+    adapter = get_adapter(WRITES_DB)
+    if not _registered:
+        adapter.register()
+        _registered = True
+    return adapter
+
+def _user_id():
+    session = g.get("session") if has_request_context() else None
+    return session.get("userID") if session is not None else None
+
+def _last_write() -> float:
+    """Returns the time of the last write of the current user, looked up once per request"""
+    if "db_last_write" not in g:
+        user_id = _user_id()
+        g.db_last_write = (_writes().get(user_id) if user_id is not None else None) or 0
+    return g.db_last_write
+
+def _wants_replica() -> bool:
+    if g.get("db_wrote"):
+        return False
+
+    target = g.get("db_reads")
+    if target is None:
+        target = REPLICA if has_request_context() and request.method in _READ_METHODS else PRIMARY
+    if target != REPLICA:
+        return False
+
+    return time.time() - _last_write() >= config.DB_REPLICA_STICKY_TIME
+
+def read_engine(engines):
+    """Returns the engine to read from in the current context, or None for the primary"""
+    if not has_app_context():
+        return None
+
+    keys = _replica_keys(engines)
+    if not keys or not _wants_replica():
+        return None
+
+    # All reads of a request go to the same replica, unless it is found unhealthy in between
+    key = g.get("db_replica")
+    if key not in keys or not is_healthy(key, engines[key]):
+        healthy = [key for key in keys if is_healthy(key, engines[key])]
+        if not healthy:
+            return None
+        key = g.db_replica = random.choice(healthy)
+    return engines[key]
+
+def record_write(engines):
+    """Sends all further reads of the request and of the user for a while to the primary, if there are replicas"""
+    if not has_app_context() or g.get("db_wrote") or not _replica_keys(engines):
+        return
+    g.db_wrote = True
+    user_id = _user_id()
+    if user_id is not None and config.DB_REPLICA_STICKY_TIME > 0:
+        _writes().set(user_id, time.time(), ttl=math.ceil(config.DB_REPLICA_STICKY_TIME))
@@ -0,0 +1,62 @@
+""" Response contract validation
+
+This module validates a sample of the API responses against the response
+schemas in `schema/`. The share of validated responses is set by
+`config.RESPONSE_VALIDATION_RATE`, the CPU time validation may take per
+request by `config.RESPONSE_VALIDATION_BUDGET`. A sampled response is skipped
+if validating its schema is expected to take longer than what is left of the
+budget. The expected cost of a skipped schema decays with every skip, so a
+single expensive response doesn't stop its schema from being validated again.
+Results are exported as counters, violations are logged as well.
+"""
+
+import random
+import time
+
+from flask import g, request
+
+import config
+from util import log, metrics
+from util.schema import get_registry
+
+checked = metrics.Counter("response_validation_checked_total", "Responses validated against their schema", ["schema"])
+violations = metrics.Counter("response_validation_violations_total", "Validated responses violating their schema", ["schema", "keyword"])
+skipped = metrics.Counter("response_validation_skipped_total", "Sampled responses skipped because the CPU budget was exhausted", ["schema"])
+
+# Weight of the latest measurement in the moving average of the validation cost per schema
+_COST_SMOOTHING = 0.2
+# Factor applied to the expected cost of a schema each time it is skipped for being too expensive
+_SKIP_DECAY = 0.5
+_costs = {}
+
+def check(schema, payload):
+    """Validates a sample of the payloads of a response schema within the CPU budget of the current request"""
+    if config.RESPONSE_VALIDATION_RATE <= 0 or random.random() >= config.RESPONSE_VALIDATION_RATE:
+        return
+
+    spent = g.get("response_validation_time", 0.0)
+    remaining = config.RESPONSE_VALIDATION_BUDGET - spent
+    if remaining <= 0:
+        skipped.inc(schema=schema)
+        return
+    if _costs.get(schema, 0.0) > remaining:
+        _costs[schema] *= _SKIP_DECAY
+        skipped.inc(schema=schema)
+        return
+
+    start = time.thread_time()
+    registry = get_registry()
+    fast_check = registry.checks.get(schema)
+    if fast_check is not None and fast_check(payload):
+        error = None
+    else:
+        # The first error is enough to count the violation, there's no need to rank all of them
+        error = next(registry.get(schema).iter_errors(payload), None)
+    cost = time.thread_time() - start
+
+    g.response_validation_time = spent + cost
+    _costs[schema] = _costs[schema] + _COST_SMOOTHING * (cost - _costs[schema]) if schema in _costs else cost
+    checked.inc(schema=schema)
+    if error is not None:
+        violations.inc(schema=schema, keyword=error.validator)
+        log.warn("Response of %s violates %s at %s: %s" % (request.endpoint, schema, error.json_path, error.message))
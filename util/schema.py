@@ -0,0 +1,85 @@
+""" JSON schema registry
+
+This module loads every JSON schema in `schema/` once and compiles it into a
+reusable validator. Invalid schemas raise on load, so a broken schema stops
+the application on startup instead of failing the requests using it.
+With `config.SCHEMA_VALIDATION` set to "compiled", valid instances are
+accepted by generated checks, see `util.schema_compiler`.
+"""
+
+import os
+import threading
+
+import jsonschema
+import simplejson as json
+from jsonschema.exceptions import best_match
+
+import config
+from util import log, schema_compiler
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "schema")
+
+class SchemaRegistry(object):
+    """Compiled validators for all schemas in a directory, by file name without extension"""
+    def __init__(self, directory=SCHEMA_DIR, compiled=None, cache_dir=None):
+        self.directory = directory
+        self.schemas = {}
+        self.validators = {}
+        self.checks = {}
+        if compiled is None:
+            compiled = config.SCHEMA_VALIDATION == "compiled"
+        if compiled and config.APP_SECRET == config.DEFAULT_APP_SECRET and config.ENVIRONMENT != "dev":
+            raise ValueError("APP_SECRET has to be set to sign cached schema checks outside the dev environment")
+
+        format_checker = jsonschema.FormatChecker()
+        for filename in sorted(os.listdir(directory)):
+            name, extension = os.path.splitext(filename)
+            if extension != ".json":
+                continue
+
+            with open(os.path.join(directory, filename), "r") as schema_file:
+                schema = json.load(schema_file)
+            validator_class = jsonschema.validators.validator_for(schema)
+            try:
+                validator_class.check_schema(schema)
+            except jsonschema.SchemaError as e:
+                raise jsonschema.SchemaError("Invalid JSON schema %s: %s" % (filename, e.message)) from e
+
+            self.schemas[name] = schema
+            self.validators[name] = validator_class(schema, format_checker=format_checker)
+
+            if compiled:
+                integer_floats = validator_class.TYPE_CHECKER.is_type(1.0, "integer")
+                try:
+                    self.checks[name] = schema_compiler.load(name, schema, format_checker, cache_dir or config.SCHEMA_CACHE_DIR, config.APP_SECRET, integer_floats)
+                except schema_compiler.UnsupportedSchema as e:
+                    log.debug("JSON schema %s is validated by jsonschema, it uses unsupported %s" % (filename, e))
+
+    def get(self, name) -> jsonschema.protocols.Validator:
+        """Returns the validator of a schema"""
+        try:
+            return self.validators[name]
+        except KeyError:
+            raise KeyError("Unknown JSON schema: " + name) from None
+
+    def validate(self, name, instance):
+        """Validates an instance, raising the same `jsonschema.ValidationError` as `jsonschema.validate`"""
+        check = self.checks.get(name)
+        if check is not None and check(instance):
+            return
+        # Errors always come from jsonschema, so both modes report the same message
+        error = best_match(self.get(name).iter_errors(instance))
+        if error is not None:
+            raise error
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> SchemaRegistry:
+    """Returns the registry of the schemas in `schema/`, loading them on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SchemaRegistry()
+    return _registry
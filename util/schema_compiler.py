@@ -0,0 +1,251 @@
+""" JSON schema compiler
+
+This module generates a specialised Python function for a JSON schema. The
+function only tells whether an instance is valid. Invalid instances are
+passed on to jsonschema, so error messages are exactly the same in both
+modes. Generated sources are cached on disk, keyed by a hash of the schema.
+Cached sources are signed and only executed if their signature matches,
+from a directory no other user can write to.
+Schemas using keywords the compiler doesn't know are left to jsonschema.
+"""
+
+import hashlib
+import hmac
+import os
+import stat
+import tempfile
+from typing import Any, Callable
+
+import simplejson as json
+
+# Increase whenever the generated code changes, so outdated cache files are ignored
+GENERATOR_VERSION = 1
+
+# Keywords without effect on validation
+_ANNOTATIONS = {"$schema", "$id", "id", "title", "description", "default", "examples", "$comment"}
+
+_SUPPORTED = {
+    "type", "enum", "format", "minLength", "maxLength", "pattern", "minimum", "maximum",
+    "properties", "required", "additionalProperties", "items", "minItems", "maxItems"
+}
+
+_TYPE_CHECKS = {
+    "object": "isinstance({0}, dict)",
+    "array": "isinstance({0}, list)",
+    "string": "isinstance({0}, str)",
+    "boolean": "isinstance({0}, bool)",
+    "null": "{0} is None",
+    "number": "(isinstance({0}, (int, float)) and not isinstance({0}, bool))",
+    "integer": "(isinstance({0}, int) and not isinstance({0}, bool))"
+}
+
+# Since draft 6, floats without a fractional part are integers as well
+_INTEGER_OR_FLOAT = "(isinstance({0}, int) and not isinstance({0}, bool) or isinstance({0}, float) and {0}.is_integer())"
+
+def _set_literal(values):
+    """Sorted set literal, used only in `in` tests, which python compiles to a constant"""
+    values = sorted(set(values))
+    return "{%s}" % ", ".join(repr(value) for value in values) if values else "()"
+
+class UnsupportedSchema(Exception):
+    """Raised for schemas that can't be compiled"""
+    pass
+
+class _Generator(object):
+    def __init__(self, integer_floats):
+        self.integer_floats = integer_floats
+        self.prelude = []
+        self._names = 0
+
+    def _name(self, prefix):
+        self._names += 1
+        return "%s%d" % (prefix, self._names)
+
+    def _type_check(self, schema_type, var):
+        if schema_type == "integer" and self.integer_floats:
+            return _INTEGER_OR_FLOAT.format(var)
+        if schema_type not in _TYPE_CHECKS:
+            raise UnsupportedSchema("type " + repr(schema_type))
+        return _TYPE_CHECKS[schema_type].format(var)
+
+    def _block(self, header, body, indent):
+        """A block that is left out if it has no body"""
+        if not body:
+            return []
+        return [indent + header] + body
+
+    def _guarded(self, header, body, indent, guarded):
+        """A block that is only entered for instances of one type, unless the type was checked already"""
+        return body if guarded else self._block(header, body, indent)
+
+    def compile(self, schema, var, indent):
+        """Returns the lines checking `var` against `schema`, returning False on the first violation"""
+        if schema is True or schema == {}:
+            return []
+        if schema is False:
+            return [indent + "return False"]
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema("schema " + repr(schema))
+        unknown = set(schema) - _ANNOTATIONS - _SUPPORTED
+        if unknown:
+            raise UnsupportedSchema("keywords " + ", ".join(sorted(unknown)))
+
+        lines = []
+        types = []
+        if "type" in schema:
+            types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+            checks = " or ".join(self._type_check(schema_type, var) for schema_type in types)
+            lines.append(indent + "if not (%s): return False" % checks)
+        # Keywords for the only allowed type need no further type check
+        known = types[0] if len(types) == 1 else None
+        inner = {
+            category: indent if known in category_types else indent + "    "
+            for category, category_types in {"string": ("string",), "number": ("number", "integer"), "object": ("object",), "array": ("array",)}.items()
+        }
+
+        if "enum" in schema:
+            if not all(isinstance(value, str) for value in schema["enum"]):
+                # Only strings compare the same in python and JSON schema
+                raise UnsupportedSchema("non string enum")
+            if known == "string":
+                lines.append(indent + "if %s not in %s: return False" % (var, _set_literal(schema["enum"])))
+            else:
+                lines.append(indent + "if not (isinstance(%s, str) and %s in %s): return False" % (var, var, _set_literal(schema["enum"])))
+
+        if "format" in schema:
+            # Format checks ignore other types on their own
+            lines.append(indent + "if not format_checker.conforms(%s, %r): return False" % (var, schema["format"]))
+
+        strings = []
+        string_indent = inner["string"]
+        if "minLength" in schema:
+            strings.append(string_indent + "if len(%s) < %d: return False" % (var, schema["minLength"]))
+        if "maxLength" in schema:
+            strings.append(string_indent + "if len(%s) > %d: return False" % (var, schema["maxLength"]))
+        if "pattern" in schema:
+            pattern = self._name("pattern")
+            self.prelude.append("%s = re.compile(%r)" % (pattern, schema["pattern"]))
+            strings.append(string_indent + "if not %s.search(%s): return False" % (pattern, var))
+        lines += self._guarded("if isinstance(%s, str):" % var, strings, indent, string_indent == indent)
+
+        numbers = []
+        number_indent = inner["number"]
+        if "minimum" in schema:
+            numbers.append(number_indent + "if %s < %r: return False" % (var, schema["minimum"]))
+        if "maximum" in schema:
+            numbers.append(number_indent + "if %s > %r: return False" % (var, schema["maximum"]))
+        lines += self._guarded("if isinstance(%s, (int, float)) and not isinstance(%s, bool):" % (var, var), numbers, indent, number_indent == indent)
+
+        objects = []
+        object_indent = inner["object"]
+        for name in schema.get("required", []):
+            objects.append(object_indent + "if %r not in %s: return False" % (name, var))
+        properties = schema.get("properties", {})
+        for name, subschema in properties.items():
+            value = self._name("v")
+            body = self.compile(subschema, value, object_indent + "    ")
+            if body:
+                objects += [object_indent + "if %r in %s:" % (name, var), object_indent + "    %s = %s[%r]" % (value, var, name)] + body
+        additional = schema.get("additionalProperties", True)
+        if additional is not True:
+            key = self._name("k")
+            value = self._name("v")
+            body = self.compile(additional, value, object_indent + "        ")
+            objects += self._block(
+                "for %s, %s in %s.items():" % (key, value, var),
+                self._block("if %s not in %s:" % (key, _set_literal(properties)), body, object_indent + "    "),
+                object_indent
+            )
+        lines += self._guarded("if isinstance(%s, dict):" % var, objects, indent, object_indent == indent)
+
+        arrays = []
+        array_indent = inner["array"]
+        if "minItems" in schema:
+            arrays.append(array_indent + "if len(%s) < %d: return False" % (var, schema["minItems"]))
+        if "maxItems" in schema:
+            arrays.append(array_indent + "if len(%s) > %d: return False" % (var, schema["maxItems"]))
+        if "items" in schema:
+            if isinstance(schema["items"], list):
+                raise UnsupportedSchema("tuple items")
+            item = self._name("v")
+            arrays += self._block("for %s in %s:" % (item, var), self.compile(schema["items"], item, array_indent + "    "), array_indent)
+        lines += self._guarded("if isinstance(%s, list):" % var, arrays, indent, array_indent == indent)
+
+        return lines
+
+def generate(name, schema, integer_floats=False) -> str:
+    """Returns the source of a module defining `is_valid(instance)` for the given schema"""
+    generator = _Generator(integer_floats)
+    body = generator.compile(schema, "instance", "    ")
+    return "\n".join(
+        ["# Generated from %s.json by util.schema_compiler, do not edit" % name, "import re", ""]
+        + generator.prelude
+        + ["", "def is_valid(instance):"] + body + ["    return True", ""]
+    )
+
+def _cache_path(cache_dir, name, schema, integer_floats):
+    digest = hashlib.sha256(
+        ("%d:%d:%s" % (GENERATOR_VERSION, integer_floats, json.dumps(schema, sort_keys=True))).encode("utf-8")
+    ).hexdigest()[:16]
+    return os.path.join(cache_dir, "%s_%s.py" % (name, digest))
+
+_SIGNATURE_PREFIX = "# signature: "
+
+def _signature(source, secret) -> str:
+    return hmac.new(secret.encode("utf-8"), source.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def _private_dir(cache_dir) -> bool:
+    """Creates the cache directory if needed, returns whether only the current user can write to it"""
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        info = os.lstat(cache_dir)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(info.st_mode):
+        return False
+    if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        return False
+    return True
+
+def _read_cached(path, secret):
+    """Returns the cached source at `path`, or None if it is missing or its signature doesn't match"""
+    try:
+        with open(path, "r") as source_file:
+            header = source_file.readline()
+            source = source_file.read()
+    except OSError:
+        return None
+    if not header.startswith(_SIGNATURE_PREFIX):
+        return None
+    if not hmac.compare_digest(header[len(_SIGNATURE_PREFIX):].strip(), _signature(source, secret)):
+        return None
+    return source
+
+def _write_cached(cache_dir, path, source, secret):
+    try:
+        # Written under a temporary name first, so other workers never read a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as tmp_file:
+            tmp_file.write(_SIGNATURE_PREFIX + _signature(source, secret) + "\n" + source)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+def load(name, schema, format_checker, cache_dir, secret, integer_floats=False) -> Callable[[Any], bool]:
+    """
+    Returns the compiled check for a schema, generating it unless it is cached in `cache_dir`.
+    Cached sources are signed with `secret`, files with a missing or wrong signature are
+    regenerated. The cache is optional, it is skipped if other users could write to
+    `cache_dir` and failing to write it is ignored.
+    """
+    path = _cache_path(cache_dir, name, schema, integer_floats)
+    cached = _private_dir(cache_dir)
+    source = _read_cached(path, secret) if cached else None
+    if source is None:
+        source = generate(name, schema, integer_floats)
+        if cached:
+            _write_cached(cache_dir, path, source, secret)
+
+    namespace = {"format_checker": format_checker}
+    exec(compile(source, path, "exec"), namespace)
+    return namespace["is_valid"]
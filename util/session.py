@@ -0,0 +1,80 @@
+"""Session state
+
+This module defines the session object which keeps track of its own
+modifications, so it only has to be written back when something changed.
+"""
+
+# Name of the redis database holding the sessions
+SESSION_DB = "sessions"
+
+class Session(dict):
+    """
+    Represents the state of a user session and records changes to it.
+    Changed top level fields are collected in `changed`, changes of single
+    team roles in `team_changes` (a role of None marks a removal).
+    A `stale` session carries outdated roles, which have to be reloaded.
+    """
+    def __init__(self, *args, **kw):
+        super(Session, self).__init__(*args, **kw)
+        self.dirty = False
+        self.stale = False
+        self.changed = set()
+        self.team_changes = {}
+
+    def _changed(self, *keys):
+        self.dirty = True
+        self.changed.update(keys)
+
+    def __setitem__(self, key, value):
+        if key not in self or super().__getitem__(key) != value:
+            self._changed(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._changed(key)
+        super().__delitem__(key)
+
+    def update(self, *args, **kw):
+        other = dict(*args, **kw)
+        self._changed(*other.keys())
+        super().update(other)
+
+    def pop(self, key, *args):
+        self._changed(key)
+        return super().pop(key, *args)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._changed(key)
+        return super().setdefault(key, default)
+
+    def clear(self):
+        self._changed(*self.keys())
+        super().clear()
+
+    def set_team_role(self, team_id, role):
+        """Sets the role for the given team"""
+        team_roles = super().setdefault("teamRoles", {})
+        if team_roles.get(str(team_id)) != role:
+            team_roles[str(team_id)] = role
+            self.dirty = True
+            self.team_changes[str(team_id)] = role
+
+    def remove_team_role(self, team_id):
+        """Removes the role for the given team, if present"""
+        team_roles = self.get("teamRoles", {})
+        if str(team_id) in team_roles:
+            del team_roles[str(team_id)]
+            self.dirty = True
+            self.team_changes[str(team_id)] = None
+
+    @property
+    def needs_save(self) -> bool:
+        """True if the session changed since it was loaded or last saved"""
+        return self.dirty
+
+    def mark_saved(self):
+        """Resets the change tracking after the session was persisted"""
+        self.dirty = False
+        self.changed = set()
+        self.team_changes = {}
@@ -0,0 +1,124 @@
+"""Session near-cache
+
+This module provides an optional per-process cache of decoded sessions.
+Entries are only kept for a few seconds and are dropped early whenever any
+worker publishes an invalidation for their token on the redis channel.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import config
+from util import log
+from util.RedisAdapter import get_adapter
+from util.session import SESSION_DB
+
+INVALIDATION_CHANNEL = "invalidate"
+
+def _copy(session):
+    # Nested maps are copied as well, so request handlers can't alter the cached state.
+    # Their own copy keeps lazy maps undecoded, the maps of a session are flat.
+    return {key: value.copy() if isinstance(value, Mapping) else value for key, value in session.items()}
+
+class SessionCache(object):
+    """Bounded LRU cache of sessions with a fixed time to live per entry"""
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Returns a copy of the cached session or None if it is missing or outdated"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires, session = entry
+            if expires < time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+
+        return _copy(session)
+
+    def put(self, token, session):
+        session = _copy(session)
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl, session)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tokens):
+        with self._lock:
+            for token in tokens:
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+_cache = None
+_listener = None
+_listener_lock = threading.Lock()
+
+def _handle_invalidation(message):
+    if _cache is not None:
+        _cache.invalidate(*message.split(","))
+
+def _handle_listener_error(e, pubsub, thread):
+    # Invalidations may have been missed, so nothing in the cache can be trusted anymore
+    log.warn("Session cache invalidation listener failed: %s" % e)
+    if _cache is not None:
+        _cache.clear()
+    thread.stop()
+
+def get_cache():
+    """Returns the session cache of the current process, or None if the cache is disabled"""
+    global _cache, _listener
+    if not config.SESSION_CACHE:
+        return None
+
+    if _listener is None or not _listener.is_alive():
+        with _listener_lock:
+            if _cache is None:
+                _cache = SessionCache(config.SESSION_CACHE_SIZE, config.SESSION_CACHE_TTL)
+            if _listener is None or not _listener.is_alive():
+                _cache.clear()
+                _listener = get_adapter(SESSION_DB).subscribe(INVALIDATION_CHANNEL, _handle_invalidation, _handle_listener_error)
+    return _cache
+
+def invalidate(*tokens):
+    """Drops the given session tokens from the caches of all workers"""
+    if not tokens:
+        return
+    if _cache is not None:
+        _cache.invalidate(*tokens)
+    if config.SESSION_CACHE:
+        get_adapter(SESSION_DB).publish(INVALIDATION_CHANNEL, ",".join(tokens))
+
+def reset():
+    """Stops the invalidation listener and drops the cache of the current process"""
+    global _cache, _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.join(timeout=5)
+        _cache = None
+        _listener = None
+
+def _reset_after_fork():
+    global _cache, _listener, _listener_lock
+    _cache = None
+    _listener = None
+    _listener_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
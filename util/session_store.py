@@ -0,0 +1,668 @@
+"""Session storage
+
+This module defines the interface of the session storage backends and its
+implementations. The backend in use is selected by `config.SESSION_STORE`:
+
+- `redis`: sessions are kept in redis (default)
+- `redis_hash`: sessions are kept in redis hashes and updated field by field
+- `memory`: sessions are kept in the memory of the current process, for single process setups and tests
+- `signed`: stateless HMAC signed tokens carrying the session, backed by a small revocation list
+"""
+
+import base64
+import copy
+import hashlib
+import hmac
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+import config
+from util import pack, session_cache
+from util.RedisAdapter import get_adapter
+from util.session import Session, SESSION_DB
+from util.structs import LazyDict
+
+SESSION_HASH_DB = "session_hashes"
+REVOCATION_DB = "revocations"
+
+def _user_index(user_id):
+    """Name of the secondary index holding all session tokens of a user"""
+    return "user_" + str(user_id)
+
+def _apply_changes(session, role=None, team_roles=None) -> bool:
+    """Applies role changes to a stored session, returns True if the session changed"""
+    changed = False
+    if role is not None and session.get("userRole") != role:
+        session["userRole"] = role
+        changed = True
+    if team_roles:
+        session_team_roles = session.setdefault("teamRoles", {})
+        for team_id, team_role in team_roles.items():
+            if team_role is None:
+                if str(team_id) in session_team_roles:
+                    del session_team_roles[str(team_id)]
+                    changed = True
+            elif session_team_roles.get(str(team_id)) != team_role:
+                session_team_roles[str(team_id)] = team_role
+                changed = True
+    return changed
+
+class SessionStore(object):
+    """Interface of the session storage backends"""
+
+    def init(self):
+        """Prepares the backend, called once on application startup"""
+        pass
+
+    def create(self, session: Session) -> str:
+        """Persists a new session, sets its `sessionToken` and returns the token"""
+        raise NotImplementedError()
+
+    def load(self, token: str) -> Optional[Session]:
+        """Returns the session of a token or None if it is unknown or expired. Slides the expiration of the session."""
+        raise NotImplementedError()
+
+    def save(self, session: Session) -> Optional[str]:
+        """Persists the changes of a session. Returns a new token if the client has to replace its current one."""
+        raise NotImplementedError()
+
+    def destroy(self, token: str, session: Session=None):
+        """Destroys a session. The session can be passed along if it was already loaded."""
+        raise NotImplementedError()
+
+    def update_user_sessions(self, user_id, role: str=None, team_roles: Dict[str, Optional[str]]=None, current: Session=None):
+        """
+        Changes the system role and the given team roles of all active sessions of a user.
+        A team role of None removes the role. The session of the current request is passed
+        as `current` and updated by the caller.
+        """
+        raise NotImplementedError()
+
+    def update_many_user_sessions(self, team_roles: Dict[Any, Dict[str, Optional[str]]], current: Session=None):
+        """
+        Changes team roles of the active sessions of many users, given as team roles by user ID.
+        Stores batch the changes of all users where possible. The session of the current request
+        is passed as `current` and updated by the caller.
+        """
+        for user_id, user_team_roles in team_roles.items():
+            self.update_user_sessions(user_id, team_roles=user_team_roles, current=current)
+
+    def destroy_user_sessions(self, user_ids) -> Optional[int]:
+        """Destroys all sessions of the given users. Returns the number of destroyed sessions, if known."""
+        raise NotImplementedError()
+
+class RedisSessionStore(SessionStore):
+    """Keeps sessions in redis, indexed by user and optionally cached per worker"""
+    def __init__(self, database=SESSION_DB):
+        self.database = database
+
+    @property
+    def redis(self):
+        return get_adapter(self.database)
+
+    def init(self):
+        self.redis.register()
+
+    def create(self, session):
+        token = str(uuid.uuid4())
+        session["sessionToken"] = token
+        self.redis.set(token, session, ttl=config.SESSION_TTL, indexes=[_user_index(session["userID"])])
+        return token
+
+    def load(self, token):
+        cache = session_cache.get_cache()
+        session = cache.get(token) if cache is not None else None
+        if session is None:
+            # Reading the session also slides its expiration, both in one round trip.
+            # Cached sessions skip the refresh, which is caught up once the cache entry expires.
+            session = self.redis.get(token, ttl=config.SESSION_TTL)
+            if session is not None and cache is not None:
+                cache.put(token, session)
+        return Session(session) if session is not None else None
+
+    def save(self, session):
+        token = session["sessionToken"]
+        self.redis.set(token, session)
+        session_cache.invalidate(token)
+        return None
+
+    def destroy(self, token, session=None):
+        if session is None:
+            session = self.redis.get(token)
+
+        if session is not None and "userID" in session:
+            self.redis.unset(token, indexes=[_user_index(session["userID"])])
+        else:
+            self.redis.unset(token)
+        session_cache.invalidate(token)
+
+    def _get_user_sessions(self, user_id):
+        """Returns all active sessions of a user, pruning index entries of expired sessions on the way"""
+        index = _user_index(user_id)
+        sessions = self.redis.get_many(self.redis.index_members(index))
+
+        expired = [key for key, value in sessions.items() if value is None]
+        self.redis.index_remove(index, *expired)
+
+        return {key: value for key, value in sessions.items() if value is not None}
+
+    def update_user_sessions(self, user_id, role=None, team_roles=None, current=None):
+        current_token = current["sessionToken"] if current is not None else None
+        updated = {}
+        for key, user_session in self._get_user_sessions(user_id).items():
+            if key != current_token and _apply_changes(user_session, role, team_roles):
+                updated[key] = user_session
+
+        self.redis.set_many(updated)
+        session_cache.invalidate(*updated)
+
+    def update_many_user_sessions(self, team_roles, current=None):
+        current_token = current["sessionToken"] if current is not None else None
+        team_roles = {str(user_id): user_team_roles for user_id, user_team_roles in team_roles.items()}
+        tokens = self.redis.index_members_by_index(_user_index(user_id) for user_id in team_roles)
+
+        # Index entries of expired sessions are left to the reaper
+        updated = {}
+        sessions = self.redis.get_many(token for index_tokens in tokens.values() for token in index_tokens if token != current_token)
+        for key, user_session in sessions.items():
+            if user_session is not None and _apply_changes(user_session, team_roles=team_roles.get(str(user_session.get("userID")))):
+                updated[key] = user_session
+
+        self.redis.set_many(updated)
+        session_cache.invalidate(*updated)
+
+    def destroy_user_sessions(self, user_ids):
+        indexes = [_user_index(user_id) for user_id in user_ids]
+        tokens = self.redis.index_members_many(indexes)
+        destroyed = self.redis.unset_many(tokens, drop_indexes=indexes)
+        session_cache.invalidate(*tokens)
+        return destroyed
+
+# Applies changes to a hash session, unless it expired in the meantime.
+# KEYS: session hash, team roles hash
+# ARGV: replace all team roles (0/1), number of fields, field/value pairs, team/role pairs.
+#       Empty values delete the field or team role.
+_UPDATE_HASH_SESSION = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[1] == '1' then
+    redis.call('del', KEYS[2])
+end
+local i = 3
+for _ = 1, tonumber(ARGV[2]) do
+    if ARGV[i + 1] == '' then
+        redis.call('hdel', KEYS[1], ARGV[i])
+    else
+        redis.call('hset', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+    i = i + 2
+end
+local roles_set = false
+while i <= #ARGV do
+    if ARGV[i + 1] == '' then
+        redis.call('hdel', KEYS[2], ARGV[i])
+    else
+        redis.call('hset', KEYS[2], ARGV[i], ARGV[i + 1])
+        roles_set = true
+    end
+    i = i + 2
+end
+if roles_set then
+    redis.call('pexpire', KEYS[2], redis.call('pttl', KEYS[1]))
+end
+return 1
+"""
+
+class RedisHashSessionStore(RedisSessionStore):
+    """
+    Keeps each session in a redis hash and its team roles in a second hash.
+    Authentication only fetches the fields in `FIELDS`, the team roles are
+    loaded on first access. Changes are written field by field, so a changed
+    team role is a single HSET or HDEL instead of rewriting the whole session.
+    """
+    FIELDS = ["userID", "userRole", "clientIP"]
+
+    def __init__(self, database=SESSION_HASH_DB):
+        super(RedisHashSessionStore, self).__init__(database)
+        self._update_script = None
+
+    @property
+    def update_script(self):
+        if self._update_script is None:
+            self._update_script = self.redis.register_script(_UPDATE_HASH_SESSION)
+        return self._update_script
+
+    def _keys(self, token):
+        # Both keys are placed by the token, so they always live on the same node
+        key = self.redis.var_key(token)
+        return key, key + "_teams"
+
+    def _load_team_roles(self, token):
+        return {
+            team_id.decode("utf-8"): role.decode("utf-8") for team_id, role in self.redis.client(token).hgetall(self._keys(token)[1]).items()
+        }
+
+    def _session(self, token, fields):
+        session = Session(fields)
+        session["teamRoles"] = LazyDict(lambda: self._load_team_roles(token))
+        session["sessionToken"] = token
+        session.mark_saved()
+        return session
+
+    def create(self, session):
+        token = str(uuid.uuid4())
+        session["sessionToken"] = token
+        key, teams_key = self._keys(token)
+        fields = {field: pack.dumps(value) for field, value in session.items() if field not in ("teamRoles", "sessionToken")}
+
+        pipe = self.redis.pipeline(token)
+        pipe.sadd(self.redis.keylist_key, token)
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, config.SESSION_TTL)
+        if session.get("teamRoles"):
+            pipe.hset(teams_key, mapping=dict(session["teamRoles"]))
+            pipe.expire(teams_key, config.SESSION_TTL)
+        pipe.sadd(self.redis.index_key(_user_index(session["userID"])), token)
+        pipe.execute()
+        return token
+
+    def load(self, token):
+        cache = session_cache.get_cache()
+        fields = cache.get(token) if cache is not None else None
+        if fields is None:
+            key, teams_key = self._keys(token)
+            # Fetch the required fields and slide the expiration in one round trip
+            pipe = self.redis.pipeline(token, transaction=False)
+            pipe.hmget(key, self.FIELDS)
+            pipe.expire(key, config.SESSION_TTL)
+            pipe.expire(teams_key, config.SESSION_TTL)
+            values, exists, _ = pipe.execute()
+            if not exists:
+                return None
+            fields = {field: pack.loads(value) for field, value in zip(self.FIELDS, values) if value is not None}
+            if cache is not None:
+                cache.put(token, fields)
+        return self._session(token, fields)
+
+    def _update_args(self, session):
+        """Script arguments for the pending changes of a session"""
+        replace_team_roles = "teamRoles" in session.changed
+        fields = [field for field in session.changed if field not in ("teamRoles", "sessionToken")]
+        args = ["1" if replace_team_roles else "0", len(fields)]
+        for field in fields:
+            args += [field, pack.dumps(session[field]) if field in session else ""]
+        team_changes = dict(session.get("teamRoles", {})) if replace_team_roles else session.team_changes
+        for team_id, role in team_changes.items():
+            args += [team_id, role if role is not None else ""]
+        return args
+
+    def save(self, session):
+        token = session["sessionToken"]
+        self.update_script(keys=list(self._keys(token)), args=self._update_args(session), client=self.redis.client(token))
+        session_cache.invalidate(token)
+        return None
+
+    def destroy(self, token, session=None):
+        if session is None:
+            user_id = self.redis.client(token).hget(self._keys(token)[0], "userID")
+            user_id = pack.loads(user_id) if user_id is not None else None
+        else:
+            user_id = session.get("userID")
+
+        pipe = self.redis.pipeline(token)
+        pipe.srem(self.redis.keylist_key, token)
+        pipe.delete(*self._keys(token))
+        if user_id is not None:
+            pipe.srem(self.redis.index_key(_user_index(user_id)), token)
+        pipe.execute()
+        session_cache.invalidate(token)
+
+    def _change_args(self, role=None, team_roles=None):
+        changes = Session()
+        if role is not None:
+            changes["userRole"] = role
+        for team_id, team_role in (team_roles or {}).items():
+            changes.team_changes[str(team_id)] = team_role
+        return self._update_args(changes)
+
+    def _update_many(self, args):
+        """Applies changes to multiple sessions, given as script arguments by token. Returns the tokens of expired sessions."""
+        # One script call per session, sent in a single round trip per node
+        expired = []
+        for node, node_tokens in self.redis.by_node(args).items():
+            if not node_tokens:
+                continue
+            pipe = node.pipeline(transaction=False)
+            for token in node_tokens:
+                self.update_script(keys=list(self._keys(token)), args=args[token], client=pipe)
+            results = pipe.execute()
+            expired += [token for token, result in zip(node_tokens, results) if not result]
+        session_cache.invalidate(*args)
+        return expired
+
+    def update_user_sessions(self, user_id, role=None, team_roles=None, current=None):
+        current_token = current["sessionToken"] if current is not None else None
+        tokens = [token for token in self.redis.index_members(_user_index(user_id)) if token != current_token]
+        if not tokens:
+            return
+
+        args = self._change_args(role, team_roles)
+        expired = self._update_many({token: args for token in tokens})
+        self.redis.index_remove(_user_index(user_id), *expired)
+
+    def update_many_user_sessions(self, team_roles, current=None):
+        current_token = current["sessionToken"] if current is not None else None
+        tokens = self.redis.index_members_by_index(_user_index(user_id) for user_id in team_roles)
+        args = {}
+        for user_id, user_team_roles in team_roles.items():
+            user_args = self._change_args(team_roles=user_team_roles)
+            args.update((token, user_args) for token in tokens[_user_index(user_id)] if token != current_token)
+        # Index entries of expired sessions are left to the reaper
+        self._update_many(args)
+
+    def destroy_user_sessions(self, user_ids):
+        indexes = [_user_index(user_id) for user_id in user_ids]
+        tokens = self.redis.index_members_many(indexes)
+
+        destroyed = 0
+        for node, node_tokens in self.redis.by_node(tokens).items():
+            pipe = node.pipeline()
+            if node_tokens:
+                pipe.srem(self.redis.keylist_key, *node_tokens)
+                pipe.delete(*[self._keys(token)[0] for token in node_tokens])
+                pipe.delete(*[self._keys(token)[1] for token in node_tokens])
+            pipe.delete(*[self.redis.index_key(index) for index in indexes])
+            results = pipe.execute()
+            if node_tokens:
+                destroyed += results[1]
+
+        session_cache.invalidate(*tokens)
+        return destroyed
+
+class MemorySessionStore(SessionStore):
+    """Keeps sessions in the memory of the current process, for single process setups and tests"""
+    def __init__(self):
+        self._sessions = {}
+        self._user_index = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def _get(self, token):
+        entry = self._sessions.get(token)
+        if entry is None:
+            return None
+        expires, session = entry
+        if expires < time.monotonic():
+            self._remove(token, session)
+            return None
+        return session
+
+    def _remove(self, token, session):
+        self._sessions.pop(token, None)
+        tokens = self._user_index.get(str(session.get("userID")))
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._user_index[str(session.get("userID"))]
+
+    def create(self, session):
+        token = str(uuid.uuid4())
+        session["sessionToken"] = token
+        with self._lock:
+            self._sessions[token] = (time.monotonic() + config.SESSION_TTL, copy.deepcopy(dict(session)))
+            self._user_index[str(session["userID"])].add(token)
+        return token
+
+    def load(self, token):
+        with self._lock:
+            session = self._get(token)
+            if session is None:
+                return None
+            self._sessions[token] = (time.monotonic() + config.SESSION_TTL, session)
+            return Session(copy.deepcopy(session))
+
+    def save(self, session):
+        token = session["sessionToken"]
+        with self._lock:
+            # Never resurrect a session that expired in the meantime
+            if self._get(token) is not None:
+                expires = self._sessions[token][0]
+                self._sessions[token] = (expires, copy.deepcopy(dict(session)))
+        return None
+
+    def destroy(self, token, session=None):
+        with self._lock:
+            stored = self._get(token)
+            if stored is not None:
+                self._remove(token, stored)
+
+    def update_user_sessions(self, user_id, role=None, team_roles=None, current=None):
+        current_token = current["sessionToken"] if current is not None else None
+        with self._lock:
+            for token in list(self._user_index.get(str(user_id), ())):
+                user_session = self._get(token)
+                if user_session is not None and token != current_token:
+                    _apply_changes(user_session, role, team_roles)
+
+    def destroy_user_sessions(self, user_ids):
+        destroyed = 0
+        with self._lock:
+            for user_id in user_ids:
+                for token in list(self._user_index.get(str(user_id), ())):
+                    user_session = self._get(token)
+                    if user_session is not None:
+                        self._remove(token, user_session)
+                        destroyed += 1
+        return destroyed
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+# Results of `RevocationList.check`
+REVOKED = "revoked"
+STALE = "stale"
+
+class RevocationList(object):
+    """
+    Revoked signed tokens and per-user cutoffs, each a single key which
+    expires once every token it affects has expired. Tokens issued before a
+    user's revocation cutoff are rejected, tokens issued before the user's
+    refresh cutoff carry outdated roles and are reissued.
+    Unless `shared` is disabled, entries are shared through redis. Each worker
+    looks up the entries of the tokens it sees and keeps the results for
+    `config.SESSION_REVOCATION_REFRESH` seconds, so the cost depends on the
+    number of active users, not on the number of revocations.
+    """
+    def __init__(self, database=REVOCATION_DB, shared=None):
+        self.database = database
+        self.shared = config.SESSION_REVOCATION_SHARED if shared is None else shared
+        # Key -> (value or None, monotonic time until which the value may be used)
+        self._entries = {}
+        self._prune_at = 1024
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self):
+        return get_adapter(self.database)
+
+    def _set_many(self, values, ttl):
+        if ttl <= 0 or not values:
+            return
+        if self.shared:
+            self.redis.set_many(values, ttl=ttl)
+            ttl = min(ttl, config.SESSION_REVOCATION_REFRESH)
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (value, time.monotonic() + ttl)
+
+    def _get_many(self, keys) -> Dict[str, Any]:
+        now = time.monotonic()
+        values = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    values[key] = entry[0]
+                else:
+                    values[key] = None
+                    missing.append(key)
+
+        if self.shared and missing:
+            fetched = self.redis.get_many(missing)
+            with self._lock:
+                for key, value in fetched.items():
+                    self._entries[key] = (value, now + config.SESSION_REVOCATION_REFRESH)
+                values.update(fetched)
+        self._prune(now)
+        return values
+
+    def _prune(self, now):
+        """Drops outdated entries once the number of entries doubled since the last time"""
+        if len(self._entries) < self._prune_at:
+            return
+        with self._lock:
+            self._entries = {key: entry for key, entry in self._entries.items() if entry[1] > now}
+            self._prune_at = max(1024, 2 * len(self._entries))
+
+    def revoke_token(self, token_id, expires):
+        """Revokes a single token until it expires"""
+        self._set_many({"t_" + token_id: expires}, int(expires - time.time()) + 1)
+
+    def revoke_user(self, user_id, not_before=None):
+        """Revokes all tokens of a user issued before `not_before`"""
+        self._set_many({"u_" + str(user_id): not_before or time.time()}, config.SESSION_TTL + 1)
+
+    def refresh_users(self, user_ids, not_before=None):
+        """Marks the claims of all tokens of the given users issued before `not_before` as outdated"""
+        not_before = not_before or time.time()
+        self._set_many({"r_" + str(user_id): not_before for user_id in user_ids}, config.SESSION_TTL + 1)
+
+    def check(self, token_id, user_id, issued_at) -> Optional[str]:
+        """Returns REVOKED if the token must be rejected, STALE if its claims are outdated, otherwise None"""
+        keys = ["t_" + token_id, "u_" + str(user_id), "r_" + str(user_id)]
+        revoked, not_before, refresh_before = (self._get_many(keys)[key] for key in keys)
+        if revoked is not None or (not_before is not None and not_before >= issued_at):
+            return REVOKED
+        if refresh_before is not None and refresh_before >= issued_at:
+            return STALE
+        return None
+
+class SignedTokenSessionStore(SessionStore):
+    """
+    Stateless sessions. The token carries the session claims, signed with
+    `config.APP_SECRET`, so loading a session needs no network round trip.
+    Changed sessions and sessions past half of their lifetime are reissued,
+    the new token is handed to the client in the `X-Session-Token` header.
+    """
+    CLAIMS = ["userID", "userRole", "teamRoles", "clientIP"]
+
+    def __init__(self, revocations: RevocationList=None):
+        self.revocations = revocations if revocations is not None else RevocationList()
+
+    def init(self):
+        if config.APP_SECRET == config.DEFAULT_APP_SECRET and config.ENVIRONMENT != "dev":
+            raise ValueError("APP_SECRET has to be set to sign session tokens outside the dev environment")
+        if self.revocations.shared:
+            self.revocations.redis.register()
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(config.APP_SECRET.encode("utf-8"), payload, hashlib.sha256).digest()
+
+    def _issue(self, session) -> str:
+        now = time.time()
+        claims = {key: session[key] for key in self.CLAIMS if key in session}
+        claims["iat"] = now
+        claims["exp"] = now + config.SESSION_TTL
+        claims["jti"] = uuid.uuid4().hex
+        payload = json.dumps(claims, separators=(",", ":")).encode("utf-8")
+        token = _b64encode(payload) + "." + _b64encode(self._sign(payload))
+        session["sessionToken"] = token
+        return token
+
+    def _decode(self, token) -> Optional[dict]:
+        """Returns the claims of a token with a valid signature"""
+        try:
+            payload, signature = token.split(".")
+            payload = _b64decode(payload)
+            if not hmac.compare_digest(self._sign(payload), _b64decode(signature)):
+                return None
+            return json.loads(payload)
+        except (ValueError, TypeError):
+            return None
+
+    def create(self, session):
+        return self._issue(session)
+
+    def load(self, token):
+        claims = self._decode(token)
+        if claims is None or claims["exp"] <= time.time():
+            return None
+        status = self.revocations.check(claims["jti"], claims["userID"], claims["iat"])
+        if status == REVOKED:
+            return None
+
+        session = Session({key: claims[key] for key in self.CLAIMS if key in claims})
+        session["sessionToken"] = token
+        session.mark_saved()
+        # The roles are reloaded by the caller, the session is then reissued
+        session.stale = status == STALE
+        if claims["exp"] - time.time() < config.SESSION_TTL / 2:
+            # Tokens can't be extended, so a fresh one is issued to slide the expiration
+            session.dirty = True
+        return session
+
+    def save(self, session):
+        claims = self._decode(session["sessionToken"])
+        if claims is not None and not session.stale and any(claims.get(key) != session.get(key) for key in self.CLAIMS):
+            # The old token carries outdated access rights. Stale tokens are covered by the refresh cutoff
+            # of their user already, so concurrent requests with them keep working.
+            self.revocations.revoke_token(claims["jti"], claims["exp"])
+        return self._issue(session)
+
+    def destroy(self, token, session=None):
+        claims = self._decode(token)
+        if claims is not None:
+            self.revocations.revoke_token(claims["jti"], claims["exp"])
+
+    def update_user_sessions(self, user_id, role=None, team_roles=None, current=None):
+        # Tokens in the hands of clients can't be changed. Their roles are reloaded on their next
+        # request instead, the current session is reissued with its updated claims after the request.
+        self.revocations.refresh_users([user_id])
+        if current is not None:
+            current.dirty = True
+
+    def update_many_user_sessions(self, team_roles, current=None):
+        self.revocations.refresh_users(team_roles)
+        if current is not None:
+            current.dirty = True
+
+    def destroy_user_sessions(self, user_ids):
+        # Stateless tokens are not tracked, so their number is unknown
+        for user_id in user_ids:
+            self.revocations.revoke_user(user_id)
+        return None
+
+_STORE_TYPES = {
+    "redis": RedisSessionStore,
+    "redis_hash": RedisHashSessionStore,
+    "memory": MemorySessionStore,
+    "signed": SignedTokenSessionStore
+}
+
+_stores = {}
+
+def get_store() -> SessionStore:
+    """Returns the session store configured by `config.SESSION_STORE`"""
+    store = _stores.get(config.SESSION_STORE)
+    if store is None:
+        store = _STORE_TYPES[config.SESSION_STORE]()
+        _stores[config.SESSION_STORE] = store
+    return store
@@ -1,3 +1,7 @@
+import bisect
+import hashlib
+from collections.abc import Mapping, MutableMapping
+
 def _sanitize_input(item):
     if type(item) is str:
         return item.strip().lower()
@@ -35,3 +39,68 @@ class UserInputList(list):
 
     def __contains__(self, key):
         return super().__contains__(_sanitize_input(key))
+
+class LazyDict(MutableMapping):
+    """A dictionary whose content is only loaded on first access"""
+    def __init__(self, loader):
+        self._loader = loader
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._loader()
+            self._loader = None
+        return self._data
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            return self.data == dict(other)
+        return NotImplemented
+
+    def copy(self):
+        return dict(self.data)
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.data)
+
+def _ring_hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+class HashRing(object):
+    """
+    Consistent hash ring mapping keys to nodes. Every node is placed on the
+    ring `replicas` times, so adding or removing a node only moves about
+    1/n of the keys.
+    """
+    def __init__(self, nodes, replicas=100):
+        self.nodes = list(nodes)
+        points = sorted((_ring_hash("%s#%d" % (node, i)), node) for node in self.nodes for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def get(self, key):
+        """Returns the node responsible for the given key"""
+        if len(self.nodes) == 1:
+            return self.nodes[0]
+        i = bisect.bisect(self._hashes, _ring_hash(str(key))) % len(self._hashes)
+        return self._owners[i]
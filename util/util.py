@@ -5,16 +5,16 @@ all submodules.
 """
 
 import hashlib
-import os
 import time
 from functools import wraps
 
 import jsonschema
-import simplejson as json
-from flask import Response, g, jsonify, request
+from flask import Response, g, request
 
 import config
 import error
+from util import json_encoder, response_validation
+from util.schema import get_registry
 
 
 def get_request_ip():
@@ -32,6 +32,10 @@ def get_request_ip():
 
 def validate(schema):
     """Decorator to validate the JSON payload against a JSON schema"""
+    registry = get_registry()
+    # Unknown schemas fail when the view is defined, not when it is called
+    registry.get(schema)
+
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kw):
@@ -44,7 +48,7 @@ def validate(schema):
                 raise error.NoJsonPayloadException()
             else:
                 try:
-                    jsonschema.validate(payload, json.load(open(os.path.dirname(os.path.realpath(__file__)) + "/../schema/" + schema + ".json", "r")), format_checker=jsonschema.FormatChecker())
+                    registry.validate(schema, payload)
                     g.payload = payload
                 except jsonschema.ValidationError as e:
                     raise error.MalformedPayloadException(e.message)
@@ -53,43 +57,94 @@ def validate(schema):
     return decorator
 
 
+def validate_response(schema):
+    """Decorator to validate a sample of the responses against a JSON schema, see `util.response_validation`"""
+    # Unknown schemas fail when the view is defined, not when it is called
+    get_registry().get(schema)
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kw):
+            g.response_schema = schema
+            return f(*args, **kw)
+        return wrapper
+    return decorator
+
 def deprecated(fn):
     """Decorator to mark an endpoint as deprecated."""
     fn.is_deprecated = True
     return fn
 
-def response(payload=None, status_code=200, error_code=None, error_message=None, success=None, empty=False, created=None):
-    """Method to build the default API response"""
-    if empty:
-        response = ""
-        status_code = 200
-        r = Response()
-    else:
+def _build_payload(payload=None, error_code=None, error_message=None, success=None, created=None):
+    response = {}
+
+    if payload is not None:
+        response = payload
+    elif success is not None or created is not None:
         response = {}
+    if success is not None:
+        response["success"] = success
+    if created is not None:
+        response["id"] = created
 
-        if payload is not None:
-            response = payload
-        elif success is not None or created is not None:
-            response = {}
-        if success is not None:
-            response["success"] = success
-        if created is not None:
-            response["id"] = created
+    if error_code is not None:
+        error_response = {"errorCode": error_code}
+        if error_message is not None:
+            error_response["errorMessage"] = error_message
+        response["error"] = error_response
 
-        if error_code is not None:
-            error_response = {"errorCode": error_code}
-            if error_message is not None:
-                error_response["errorMessage"] = error_message
-            response["error"] = error_response
+    return response
 
-        r = jsonify(**response)
+def render(payload=None, error_code=None, error_message=None, success=None, created=None) -> bytes:
+    """Renders the body of a default API response, for bodies that are built once and reused"""
+    return json_encoder.dumps(_build_payload(payload, error_code, error_message, success, created))
 
-        if error_code is not None:
-            r.headers.add("X-ErrorCode", error_code)
+def rendered_response(body, status_code=200, error_code=None):
+    """Builds a response from a body returned by `render`, with a fresh set of headers"""
+    r = Response(body, mimetype="application/json")
+
+    if error_code is not None:
+        r.headers.add("X-ErrorCode", error_code)
 
     r.status_code = status_code
 
     return r
 
+def etag(*parts) -> str:
+    """Strong entity tag of a representation, derived from the versions it depends on"""
+    return hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+
+def _set_validators(r, etag):
+    r.set_etag(etag)
+    # Responses are per user, clients have to revalidate them on every use
+    r.cache_control.private = True
+    r.cache_control.no_cache = True
+
+def not_modified(etag):
+    """Returns a 304 response if the client's If-None-Match matches the entity tag, None otherwise"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+
+    r = Response(status=304)
+    _set_validators(r, etag)
+    return r
+
+def response(payload=None, status_code=200, error_code=None, error_message=None, success=None, empty=False, created=None, etag=None):
+    """Method to build the default API response"""
+    if empty:
+        r = Response()
+        r.status_code = 200
+        return r
+
+    response = _build_payload(payload, error_code, error_message, success, created)
+
+    if error_code is None and g.get("response_schema") is not None:
+        response_validation.check(g.response_schema, response)
+
+    r = rendered_response(json_encoder.dumps(response), status_code, error_code)
+    if etag is not None:
+        _set_validators(r, etag)
+    return r
+
 def hash_password(string):
     return str(hashlib.sha1(string.encode('utf-8')).hexdigest())
@@ -0,0 +1,72 @@
+"""Export routes
+
+Blueprint defining admin routes streaming users, teams and team memberships
+as newline-delimited JSON, one object per line.
+"""
+
+from datetime import datetime, timezone
+from enum import Enum
+
+from flask import Blueprint, Response, request, stream_with_context
+
+import config
+from model.Roles import SystemRole
+from modules.export import controller
+from error import BadParameterError
+from util import json_encoder
+from util.auth import require
+
+export = Blueprint("export", __name__)
+
+def _since():
+    """Returns the `since` parameter as naive UTC datetime, as stored in the database"""
+    value = request.args.get("since")
+    if value is None:
+        return None
+
+    try:
+        since = datetime.fromisoformat(value)
+    except ValueError:
+        raise BadParameterError("since must be an ISO 8601 timestamp")
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+def _value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        # ISO 8601, so the latest timestamp of an export can be passed as `since` of the next one
+        return value.isoformat()
+    return value
+
+def _stream(rows):
+    """Streams rows as NDJSON, written in chunks of `config.EXPORT_BATCH_SIZE` lines"""
+    encode = json_encoder.get_encoder()
+
+    def generate():
+        lines = []
+        for row in rows:
+            lines.append(encode({key: _value(value) for key, value in row.items()}))
+            if len(lines) >= config.EXPORT_BATCH_SIZE:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@export.route("/users", methods=["GET"])
+def exportUsers():
+    require(SystemRole.GLOBAL_ADMIN)
+    return _stream(controller.export_users(_since()))
+
+@export.route("/teams", methods=["GET"])
+def exportTeams():
+    require(SystemRole.GLOBAL_ADMIN)
+    return _stream(controller.export_teams(_since()))
+
+@export.route("/members", methods=["GET"])
+def exportTeamMembers():
+    require(SystemRole.GLOBAL_ADMIN)
+    return _stream(controller.export_team_members(_since()))
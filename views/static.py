@@ -3,8 +3,10 @@
 Blueprint defining static API routes.
 """
 
-from flask import Blueprint, send_file
-from util import response
+from flask import Blueprint, Response, request
+from error import AccessDeniedError
+from util import metrics, response
+from util.assets import StaticAsset
 from util.auth import noauth
 import config
 import socket
@@ -12,6 +14,10 @@ import time
 
 static = Blueprint("static", __name__)
 
+# Loaded and compressed once on startup
+_spec = StaticAsset("openapi.yaml", "application/yaml")
+_doc = StaticAsset("doc.html")
+
 
 @noauth
 @static.route("/info", methods=["GET"])
@@ -36,12 +42,19 @@ def ping_backend():
 def raise_error():
     raise Exception()
 
+@static.route("/metrics", methods=["GET"])
+@noauth
+def export_metrics():
+    if config.METRICS_TOKEN is not None and request.headers.get("X-Metrics-Token") != config.METRICS_TOKEN:
+        raise AccessDeniedError()
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @static.route("/openapi.yaml", methods=["GET"])
 @noauth
 def serve_spec():
-    return send_file("static/openapi.yaml")
+    return _spec.response()
 
 @static.route("/doc.html", methods=["GET"])
 @noauth
 def render_doc():
-    return send_file("static/doc.html")
+    return _doc.response()
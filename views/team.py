@@ -10,21 +10,24 @@ from modules.team import controller
 from modules.user import controller as user_controller
 from model.Roles import SystemRole
 from error import APIException, NotFoundError, BadParameterError
-from util import response, validate
+from util import response, validate, validate_response, etag, not_modified
 from util.auth import restrict_to, require
+from util.pagination import page_args
 from util.structs import UserInputDict
 
 team = Blueprint("team", __name__)
 
 @team.route("", methods=["GET"])
+@validate_response("team_list_resp")
 def listTeams():
-    payload = []
+    limit, cursor = page_args()
+    user_teams, next_cursor = controller.get_user_teams(limit=limit, cursor=cursor)
 
-    user_teams = controller.get_user_teams()
+    payload = {"teams": [t.to_response() for t in user_teams]}
+    if next_cursor is not None:
+        payload["next_cursor"] = next_cursor
 
-    payload = [t.to_response() for t in user_teams]
-
-    return response(payload={"teams" : payload})
+    return response(payload=payload)
 
 @team.route("", methods=["POST"])
 @restrict_to(SystemRole.USER)
@@ -43,11 +46,20 @@ def createTeam():
     return(response(payload={"id": str(team.id)}))
 
 @team.route("/<teamId>", methods=["GET"])
+@validate_response("team_info_resp")
 def getTeam(teamId):
     team = controller.get_team_by_id(teamId)
 
+    tag = etag("team", team.id, team.version)
+    cached = not_modified(tag)
+    if cached is not None:
+        return cached
+
+    # One query for all members, instead of two per member through the association proxy
+    users, _ = controller.get_team_members(team)
+
     members = []
-    for m in team.members:
+    for m in users:
         members.append({"id": m.id, "mail": m.mail, "role": str(m.role)})
     
     payload = {
@@ -55,7 +67,7 @@ def getTeam(teamId):
         "members" : members
     }
     
-    return response(payload=payload)
+    return response(payload=payload, etag=tag)
 
 @team.route("/<teamId>", methods=["PATCH"])
 @restrict_to(SystemRole.USER)
@@ -67,11 +79,20 @@ def updateTeam(teamId):
     return response(success=True)
 
 @team.route("/<teamId>/members", methods=["GET"])
+@validate_response("team_member_resp")
 def listTeamMembers(teamId):
+    limit, cursor = page_args()
     team = controller.get_team_by_id(teamId)
 
+    tag = etag("team_members", team.id, team.version, limit, cursor)
+    cached = not_modified(tag)
+    if cached is not None:
+        return cached
+
+    users, next_cursor = controller.get_team_members(team, limit=limit, cursor=cursor)
+
     members = []
-    for m in team.members:
+    for m in users:
         current_member = {
             "id" : str(m.id),
             "mail": m.mail
@@ -82,7 +103,11 @@ def listTeamMembers(teamId):
             current_member["role"] = m.role.value
         members.append(current_member)
 
-    return response(payload={"members": members})
+    payload = {"members": members}
+    if next_cursor is not None:
+        payload["next_cursor"] = next_cursor
+
+    return response(payload=payload, etag=tag)
 
 @team.route("/<teamId>/members", methods=["PATCH"])
 @restrict_to(SystemRole.USER)
@@ -11,11 +11,11 @@ from flask import Blueprint, g, request
 from util import auth
 from modules.user import controller
 from modules.team import controller as team_controller
-from util.auth import noauth, restrict_to, authenticate
-from error import APIException, NotFoundError, BadParameterError, AccessDeniedError
+from util.auth import noauth, restrict_to, authenticate, require
+from error import APIException, NotFoundError, BadParameterError, AccessDeniedError, prerendered
 from model.User import User
 from model.Roles import SystemRole
-from util import response, validate, hash_password
+from util import response, validate, validate_response, hash_password, etag, not_modified
 from util.structs import UserInputDict
 
 user = Blueprint("user", __name__)
@@ -27,6 +27,7 @@ def check_trial(user):
         raise TrialPeriodExpiredError()
 
 @user.route("/info", methods=["GET"])
+@validate_response("user_info_resp")
 def getUserInfo():
     user_id = g.session["userID"]
 
@@ -34,6 +35,16 @@ def getUserInfo():
     
     # Check for trial period
     check_trial(u)
+
+    args = UserInputDict(request.args)
+    expanded_team = None
+    if g.session["userRole"] != "coach" and "team" in args.get_list("expand", []):
+        expanded_team = team_controller.get_team_by_id(g.session["team"])
+
+    tag = etag("user", u.id, u.version, g.session["userRole"], g.session.get("team"), expanded_team and expanded_team.version)
+    cached = not_modified(tag)
+    if cached is not None:
+        return cached
     
     payload = {
         "id"   : str(u.id)
@@ -50,12 +61,9 @@ def getUserInfo():
 
     session = {}
     if g.session["userRole"] != "coach":
-        args = UserInputDict(request.args)
-        expand = args.get_list("expand", [])
-
         team = g.session["team"]
-        if "team" in expand:
-            team = team_controller.get_team_by_id(g.session["team"]).to_response()
+        if expanded_team is not None:
+            team = expanded_team.to_response()
 
         session = {
             "team": team,
@@ -67,7 +75,7 @@ def getUserInfo():
 
     payload["session"] = session
     
-    return response(payload=payload)
+    return response(payload=payload, etag=tag)
 
 @user.route("/register", methods=["POST"])
 @validate("user_registration_req")
@@ -152,6 +160,7 @@ def removeUserTrialPeriod():
 @user.route("/login", methods=["POST"])
 @noauth
 @validate("user_login_req")
+@validate_response("user_login_resp")
 def loginUser():
     u = controller.get_user_by_mail(g.payload["mail"])
     if not u or not u.password_hash:
@@ -169,29 +178,48 @@ def logoutUser():
     auth.destroy_session(g.session["sessionToken"])
     return response(success=True)
 
+@user.route("/logout/all", methods=["POST"])
+def logoutUserEverywhere():
+    revoked = controller.revoke_sessions([g.session["userID"]])
+    return response(payload={"revoked": revoked})
+
+@user.route("/sessions/revoke", methods=["POST"])
+@validate("user_sessions_revoke_req")
+def revokeUserSessions():
+    require(SystemRole.GLOBAL_ADMIN)
+
+    revoked = controller.revoke_sessions(g.payload["users"])
+    return response(payload={"revoked": revoked})
+
 def _check_password(password):
     return (len(password) > 4)
 
+@prerendered
 class InvalidPasswordFormatError(APIException):
     def __init__(self):
         super(InvalidPasswordFormatError, self).__init__(status_code=400, error_code=1201, message="Password must be at least 5 characters in length")
 
+@prerendered
 class UsernameTakenError(APIException):
     def __init__(self):
         super(UsernameTakenError, self).__init__(status_code=409, error_code=1202, message="The e-mail is already registered in the system")
 
+@prerendered
 class InvalidCredentialsError(APIException):
     def __init__(self):
         super(InvalidCredentialsError, self).__init__(status_code=403, error_code=1203, message="Username and password do not match a user account")
 
+@prerendered
 class SessionAlreadyRegisteredError(APIException):
     def __init__(self):
         super(SessionAlreadyRegisteredError, self).__init__(status_code=422, error_code=1204, message="The session is already registered to another user")
 
+@prerendered
 class InvitationExpiredError(APIException):
     def __init__(self):
         super(InvitationExpiredError, self).__init__(status_code=423, error_code=1205, message="The invitation is no longer valid")
 
+@prerendered
 class TrialPeriodExpiredError(APIException):
     def __init__(self):
         super(TrialPeriodExpiredError, self).__init__(status_code=423, error_code=1206, message="The trial period has expired")
\ No newline at end of file